@@ -31,7 +31,6 @@ library files.
 """
 
 from __future__ import absolute_import, unicode_literals, division
-import six
 from six.moves import map
 from io import open
 
@@ -454,7 +453,7 @@ class QLib(object):
 
         res_not_in_lib = set()
         # add them to the residues in the library
-        for resname, imps in six.iteritems(impropers):
+        for resname, imps in impropers.items():
             for imp in imps:
                 try:
                     # different naming convention for head and tail
@@ -887,7 +886,7 @@ class _LibResidue(object):
         if abs(excess) > 1e-7:
             # only unique atoms, with abs charges
             atom_dict2 = {name: abs(charge) for name, charge in
-                          six.iteritems(atom_dict) if \
+                          atom_dict.items() if \
                           list(atom_dict.values()).count(charge) == 1}
             # maximum charge atom
             max_ch_atom = max(atom_dict2, key=lambda x: atom_dict2[x])
@@ -917,7 +916,7 @@ class _LibResidue(object):
         infol, al, bl, il, cl, brl, col = [], [], [], [], [], [], []
 
         indent = "        "
-        for k, v in six.iteritems(self.info):
+        for k, v in self.info.items():
             infol.append(indent + "{:30} {}".format(k, v))
         for i, atom in enumerate(self.atoms):
             al.append("    {:>5d}  {a.name:<5s}  {a.atom_type:<12s} "
@@ -943,7 +942,7 @@ class _LibResidue(object):
                             ("charge_groups", cl)))
 
         outstr = "{{{}}}\n".format(self.name)
-        for section, lines in six.iteritems(outl):
+        for section, lines in outl.items():
             if lines:
                 outstr += """\
     [{}]
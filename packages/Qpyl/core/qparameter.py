@@ -30,21 +30,64 @@ This module implements the QPrm class for reading and writing Q (and other)
 parameter files.
 """
 
-from __future__ import absolute_import, unicode_literals, division
-import six
-from six.moves import map
-from six.moves import zip
-from io import open
-
-import re
+import io
 import math
 import logging
+from sys import intern
+from array import array
 from collections import OrderedDict
+from operator import itemgetter, attrgetter
 
 from Qpyl.common import __version__, raise_or_log
 
 logger = logging.getLogger(__name__)
 
+# sorting keys of parameters in the output of QPrm.get_string
+_prm_id_key = attrgetter("prm_id")
+_generic_sort_key = attrgetter("_generic_sort_key")
+
+# characters starting a comment in Q parameter files
+_COMMENT_CHARS = ("#", "*", "!")
+
+# LJ_A/R, LJ_B/eps and mass columns in the [atom_types] section
+_PRM_ATOM_VALUES = itemgetter(1, 3, 6)
+
+# str.translate table removing all non-letter ASCII characters
+# (element from FFLD vdw type)
+_DELETE_NON_ALPHA = str.maketrans("", "", "".join(chr(i) for i in range(128)
+                                                  if not chr(i).isalpha()))
+
+# Fourier terms of OPLS torsions in FFLD files (V1-V4).
+# Mult. signs in Q don't actually matter for reading the torsion
+# parameters. Let's stick to positive values. (Q also evaluates the
+# sign in the energies. Fortunately, prms with phi0=0/180 are not
+# affected)
+_FFLD_TORSION_MULTS = (1.0, 2.0, 3.0, 4.0)
+_FFLD_TORSION_PHI0S = (0.0, 180.0, 0.0, 180.0)
+_FFLD_TORSION_PATHS = (1.0, 1.0, 1.0, 1.0)
+
+# beginnings of section header lines in FFLD files
+_FFLD_SECTION_HEADERS = (("atom   type  vdw  symbol", "ATOMS"),
+                         ("Stretch            k", "BONDS"),
+                         ("Bending                      k", "ANGLES"),
+                         ("proper Torsion", "TORSIONS"),
+                         ("improper", "IMPROPERS"))
+_FFLD_HEADER_PREFIXES = tuple(h for h, _ in _FFLD_SECTION_HEADERS)
+
+# Amber parm/frcmod files are plain ASCII (only comments, which are
+# ignored, might contain anything else). A single-byte codec is the
+# cheapest to decode and can't fail, unlike the locale's default.
+_AMBER_ENCODING = "latin-1"
+
+# fixed-width columns of records in Amber parm/frcmod files
+# (atom types..., numeric fields...)
+_AMBER_BOND_COLS = itemgetter(slice(0, 2), slice(3, 5),
+                              slice(5, 15), slice(15, 25))
+_AMBER_ANGLE_COLS = itemgetter(slice(0, 2), slice(3, 5), slice(6, 8),
+                               slice(8, 18), slice(18, 28))
+_AMBER_TORSION_COLS = itemgetter(slice(0, 2), slice(3, 5), slice(6, 8),
+                                 slice(9, 11), slice(11, 15),
+                                 slice(15, 30), slice(30, 45))
 
 ATOM_MASSES = { "H": 1.0079,
                 "C": 12.011,
@@ -59,6 +102,35 @@ ATOM_MASSES = { "H": 1.0079,
                 "DU": 0 }
 
 
+def _amber_atom_types(line, fields):
+    """Return the stripped and interned atom types from a fixed-width
+    Amber record.
+
+    Types with asterisks (C*, N*) are renamed (Cstar, Nstar); the
+    replacement is skipped entirely unless 'line' contains a '*'.
+    """
+    if "*" in line:
+        return [intern(x.strip().replace("*", "star")) for x in fields]
+    return [intern(x.strip()) for x in fields]
+
+
+def _split_comment(line):
+    """Split a line at the first comment character.
+
+    Returns a (code, comment) tuple of stripped strings, with whitespace
+    in the comment collapsed; comment is empty if there is none.
+    """
+    # cutting at each character in turn leaves the text before the
+    # first one of them
+    code = line
+    for c in _COMMENT_CHARS:
+        code = code.partition(c)[0]
+    if len(code) == len(line):
+        return line.strip(), ""
+    comment = " ".join(line[len(code)+1:].strip().strip("!").split())
+    return code.strip(), comment
+
+
 class QPrmError(Exception):
     pass
 
@@ -73,9 +145,13 @@ class QPrm(object):
        ignore_errors (boolean):  Optional, default is False.\
                                  If set to True, some non-vital\
                                  exceptions are logged instead.
+       keep_comments (boolean):  Optional, default is True.\
+                                 If set to False, comments of parsed\
+                                 parameters are not stored (or written).
     """
-    def __init__(self, ff_type, ignore_errors=False):
+    def __init__(self, ff_type, ignore_errors=False, keep_comments=True):
         self.ignore_errors = ignore_errors
+        self.keep_comments = keep_comments
         supported_ff = ['oplsaa', 'amber']
         ff_type = ff_type.lower()
         if ff_type not in supported_ff:
@@ -83,16 +159,41 @@ class QPrm(object):
                             "Use {}".format(ff_type,
                                             " or ".join(supported_ff)))
         self.ff_type = ff_type
+        # options are written out in the order they were read,
+        # parameters are always sorted in get_string
         self.options = OrderedDict()
-        self.amber_masses = OrderedDict()
-        self.atom_types = OrderedDict()
-        self.bonds = OrderedDict()
-        self.angles = OrderedDict()
-        self.generic_torsions = OrderedDict()   # with wildcards
-        self.torsions = OrderedDict()
-        self.generic_impropers = OrderedDict()  # with wildcards
-        self.impropers = OrderedDict()
-
+        self.amber_masses = {}
+        self.atom_types = {}
+        self.bonds = {}
+        self.angles = {}
+        self.generic_torsions = {}   # with wildcards
+        self.torsions = {}
+        self.generic_impropers = {}  # with wildcards
+        self.impropers = {}
+
+        # dictionaries of parsed parameters: (specific, generic)
+        self._prm_dicts = {"atoms": (self.atom_types, None),
+                           "bonds": (self.bonds, None),
+                           "angles": (self.angles, None),
+                           "torsions": (self.torsions,
+                                        self.generic_torsions),
+                           "impropers": (self.impropers,
+                                         self.generic_impropers)}
+
+        # line parsers for sections in FFLD files (read_ffld)
+        self._ffld_section_parsers = {"ATOMS": self._parse_ffld_atom,
+                                      "BONDS": self._parse_ffld_bond,
+                                      "ANGLES": self._parse_ffld_angle,
+                                      "TORSIONS": self._parse_ffld_torsion,
+                                      "IMPROPERS": self._parse_ffld_improper}
+
+        # line parsers for sections in Q parameter files (read_prm)
+        self._prm_section_parsers = {"options": self._parse_prm_option,
+                                     "atom_types": self._parse_prm_atom_type,
+                                     "bonds": self._parse_prm_bond,
+                                     "angles": self._parse_prm_angle,
+                                     "torsions": self._parse_prm_torsion,
+                                     "impropers": self._parse_prm_improper}
 
 
     def read_prm(self, parm_fn):
@@ -112,26 +213,34 @@ class QPrm(object):
         """
 
         section = None
+        parse_line = None   # parser of lines in current section
         prms = {"atoms": [],
                 "bonds": [],
                 "angles": [],
                 "torsions": [],
                 "impropers": []}
 
-        with open(parm_fn, 'r') as prmfile:
-            for lnumber, line in enumerate(prmfile.readlines()):
-                lnumber += 1
-
-                line, comment = [x.strip() for x in \
-                        re.split("#|\*|\!", line+"!", 1)]
-                comment = " ".join(comment.strip("!").split())
+        # loop invariants as locals
+        section_parsers = self._prm_section_parsers
+        comment_chars = _COMMENT_CHARS
+        split_comment = _split_comment
+        keep_comments = self.keep_comments
 
-                if line == "":
+        with open(parm_fn, 'r') as prmfile:
+            for lnumber, line in enumerate(prmfile, 1):
+                line = line.strip()
+                # skip blank and comment-only lines early
+                if not line or line[0] in comment_chars:
                     continue
+
+                line, comment = split_comment(line)
+                if not keep_comments:
+                    comment = None
                 if line[0] == "[":
                     # it is apparently allowed to write text after
                     # the section identifier, so a simple strip isn't enough
                     section = line.split("]")[0].strip(" [").lower()
+                    parse_line = section_parsers.get(section)
                     continue
                 if not section:
                     raise QPrmError("Line {} in PARM file '{}' is not a "
@@ -139,134 +248,132 @@ class QPrm(object):
                                     "([atom_types], [bonds], ...):\n{}"
                                     .format(lnumber, parm_fn, line))
 
-
-                if section == "options":
-                    try:
-                        key, value = line.split()
-                    except ValueError:
-                        raise QPrmError("Malformed key/value pair in "
-                                        "[options] section of parm file: {}"
-                                        "".format(line))
-                    self.options[key] = value
-
-
-                elif section == "atom_types":
-                    parms = line.split()
-                    try:
-                        atom_type = parms[0]
-                        lj_Ar, lj_Beps = float(parms[1]), float(parms[3])
-                        mass = float(parms[6])
-                    except Exception as e:
-                        raise QPrmError("Could not parse line {} in "
-                                        "[atom_types] section of parm file "
-                                        "'{}':\n{}"
-                                        .format(lnumber, parm_fn, line))
-
-                    if self.ff_type == "oplsaa":
-                        atom_type = _PrmAtom(atom_type, mass,
-                                             lj_A=lj_Ar, lj_B=lj_Beps,
-                                             comment=comment)
-                    elif self.ff_type == "amber":
-                        atom_type = _PrmAtom(atom_type, mass,
-                                             lj_R=lj_Ar, lj_eps=lj_Beps,
-                                             comment=comment)
-
-                    prms["atoms"].append(atom_type)
-
-
-                elif section == "bonds":
-                    parms = line.split()
-                    try:
-                        atom_types = parms[0:2]
-                        fc, r0 = float(parms[2]), float(parms[3])
-                    except Exception as e:
-                        raise QPrmError("Could not parse line {} in [bonds] "
-                                        "section of parm file '{}':\n{}"
-                                        .format(lnumber, parm_fn, line))
-
-                    bond = _PrmBond(atom_types, fc, r0, comment=comment)
-                    prms["bonds"].append(bond)
-
-                elif section == "angles":
-                    parms = line.split()
-                    try:
-                        atom_types = parms[0:3]
-                        fc, theta0 = float(parms[3]), float(parms[4])
-                    except Exception as e:
-                        raise QPrmError("Could not parse line {} in [angles] "
-                                        "section of parm file '{}':\n{}"
-                                        .format(lnumber, parm_fn, line))
-
-                    angle = _PrmAngle(atom_types, fc, theta0,
-                                      comment=comment)
-                    prms["angles"].append(angle)
-
-                elif section == "torsions":
-                    parms = line.split()
-                    try:
-                        atom_types = parms[0:4]
-                        fc, multiplicity, phase, npaths = map(float, parms[4:8])
-                    except Exception as e:
-                        raise QPrmError("Could not parse line {} in [torsions]"
-                                        " section of parm file '{}':\n{}"
-                                        .format(lnumber, parm_fn, line))
-
-                    torsion = _PrmTorsion(atom_types, comment=comment)
-
-                    # Important note:
-                    # Torsion parameters belonging to the same torsion
-                    # are assumed to be sequential in the parameter file,
-                    # otherwise there is no way of knowing which
-                    # parameters belong together.
-                    # Q treats all parameters independently, thus
-                    # allowing non-sequential parameters. This
-                    # can easily lead to duplicate or mixed parameters
-                    # and no way of determining it.
-                    if prms["torsions"] and torsion.prm_id == \
-                            prms["torsions"][-1].prm_id:
-                        torsion = prms["torsions"][-1]
-                    else:
-                        prms["torsions"].append(torsion)
-
-                    try:
-                        torsion.add_prm(fc,
-                                        multiplicity,
-                                        phase,
-                                        npaths)
-                    # in case of two parms sharing same multiplicity
-                    except ValueError:
-                        raise QPrmError("Duplicate parameter found: {}"
-                                        .format(torsion))
-
-
-
-                elif section == "impropers":
-                    parms = line.split()
-                    try:
-                        atom_types = parms[0:4]
-                        center_atom = atom_types.pop(1)
-                        fc, phi0 = map(float, parms[4:6])
-                    except Exception as e:
-                        raise QPrmError("Could not parse line {} in "
-                                        "[impropers] section of parm file '{}'"
-                                        ":\n{}".format(lnumber, parm_fn, line))
-
-
-                    improper = _PrmImproper(center_atom, atom_types, fc, phi0,
-                                            comment=comment)
-                    prms["impropers"].append(improper)
-
-                else:
+                if parse_line is None:
                     raise QPrmError("Unknown section found in the parm file "
                                     "{}: {}".format(parm_fn, section))
+                parse_line(line, comment, prms, lnumber, parm_fn)
+
+        return self._add_prms(prms)
+
+
+    # Parsers of single lines in the sections of Q parameter files,
+    # used by read_prm (see QPrm._prm_section_parsers).
+    # The parsed parameters are appended to the lists in 'prms'.
+
+    def _parse_prm_option(self, line, comment, prms, lnumber, parm_fn):
+        try:
+            key, value = line.split()
+        except ValueError:
+            raise QPrmError("Malformed key/value pair in "
+                            "[options] section of parm file: {}"
+                            "".format(line))
+        self.options[key] = value
+
+
+    def _parse_prm_atom_type(self, line, comment, prms, lnumber, parm_fn):
+        parms = line.split()
+        try:
+            atom_type = intern(parms[0])
+            lj_Ar, lj_Beps, mass = map(float, _PRM_ATOM_VALUES(parms))
+        except Exception as e:
+            raise QPrmError("Could not parse line {} in "
+                            "[atom_types] section of parm file "
+                            "'{}':\n{}"
+                            .format(lnumber, parm_fn, line))
+
+        if self.ff_type == "oplsaa":
+            atom_type = _PrmAtom(atom_type, mass,
+                                 lj_A=lj_Ar, lj_B=lj_Beps,
+                                 comment=comment)
+        elif self.ff_type == "amber":
+            atom_type = _PrmAtom(atom_type, mass,
+                                 lj_R=lj_Ar, lj_eps=lj_Beps,
+                                 comment=comment)
+
+        prms["atoms"].append(atom_type)
+
+
+    def _parse_prm_bond(self, line, comment, prms, lnumber, parm_fn):
+        parms = line.split()
+        try:
+            atom_types = [intern(x) for x in parms[0:2]]
+            fc, r0 = map(float, parms[2:4])
+        except Exception as e:
+            raise QPrmError("Could not parse line {} in [bonds] "
+                            "section of parm file '{}':\n{}"
+                            .format(lnumber, parm_fn, line))
+
+        bond = _PrmBond(atom_types, fc, r0, comment=comment)
+        prms["bonds"].append(bond)
+
+
+    def _parse_prm_angle(self, line, comment, prms, lnumber, parm_fn):
+        parms = line.split()
+        try:
+            atom_types = [intern(x) for x in parms[0:3]]
+            fc, theta0 = map(float, parms[3:5])
+        except Exception as e:
+            raise QPrmError("Could not parse line {} in [angles] "
+                            "section of parm file '{}':\n{}"
+                            .format(lnumber, parm_fn, line))
+
+        angle = _PrmAngle(atom_types, fc, theta0, comment=comment)
+        prms["angles"].append(angle)
+
+
+    def _parse_prm_torsion(self, line, comment, prms, lnumber, parm_fn):
+        parms = line.split()
+        try:
+            atom_types = [intern(x) for x in parms[0:4]]
+            fc, multiplicity, phase, npaths = map(float, parms[4:8])
+        except Exception as e:
+            raise QPrmError("Could not parse line {} in [torsions]"
+                            " section of parm file '{}':\n{}"
+                            .format(lnumber, parm_fn, line))
+
+        # Important note:
+        # Torsion parameters belonging to the same torsion
+        # are assumed to be sequential in the parameter file,
+        # otherwise there is no way of knowing which
+        # parameters belong together.
+        # Q treats all parameters independently, thus
+        # allowing non-sequential parameters. This
+        # can easily lead to duplicate or mixed parameters
+        # and no way of determining it.
+        torsions = prms["torsions"]
+        if torsions and torsions[-1].prm_id == \
+                _PrmTorsion.get_id(atom_types):
+            torsion = torsions[-1]
+        else:
+            torsion = _PrmTorsion(atom_types, comment=comment)
+            torsions.append(torsion)
+
+        try:
+            torsion.add_prm(fc,
+                            multiplicity,
+                            phase,
+                            npaths)
+        # in case of two parms sharing same multiplicity
+        except ValueError:
+            raise QPrmError("Duplicate parameter found: {}"
+                            .format(torsion))
+
+
+    def _parse_prm_improper(self, line, comment, prms, lnumber, parm_fn):
+        parms = line.split()
+        try:
+            atom_types = [intern(x) for x in parms[0:4]]
+            center_atom = atom_types.pop(1)
+            fc, phi0 = map(float, parms[4:6])
+        except Exception as e:
+            raise QPrmError("Could not parse line {} in "
+                            "[impropers] section of parm file '{}'"
+                            ":\n{}".format(lnumber, parm_fn, line))
+
+        improper = _PrmImproper(center_atom, atom_types, fc, phi0,
+                                comment=comment)
+        prms["impropers"].append(improper)
 
-        dups = []
-        for type_, params in six.iteritems(prms):
-            for prm in params:
-                dup = self._add_prm(prm)
-                if dup != None:
-                    dups.append(dup)
-        return dups
 
 
 
@@ -297,130 +404,19 @@ class QPrm(object):
                 "torsions": [],
                 "impropers": []}
 
-        with open(parm_fn) as parmf:
+        with open(parm_fn, encoding=_AMBER_ENCODING) as parmf:
             # line with FF description
             parmf.readline()
 
-            # get the masses
-            while True:
-                line = parmf.readline().split()
-                if not line: break
-                try:
-                    atom_name, mass = line[0].replace("*", "star"), float(line[1])
-                except Exception as e:
-                    raise QPrmError("Could not parse line '{}'".format(line))
-                try:
-                    old_mass = self.amber_masses[atom_name]
-                except KeyError:
-                    self.amber_masses[atom_name] = mass
-                else:
-                    if abs(mass - old_mass) > 0.00001:
-                        raise_or_log("Different masses for same type ({}): "
-                                     "{}, {}"
-                                     .format(atom_name, mass, old_mass),
-                                     QPrmError, logger, self.ignore_errors)
+            self._read_amber_masses(parmf, self.ignore_errors)
 
             # useless line (hydrophilic atoms?)
             parmf.readline()
 
-            # get the bond types
-            while True:
-                line = parmf.readline().strip()
-                if not line: break
-                try:
-                    a_types = line[0:2], line[3:5]
-                    a_types = [x.strip().replace("*", "star") for x in a_types]
-                    fc, r0 = float(line[5:15]), float(line[15:25])
-                    fc *= 2   # In Q the fc is divided by 2
-                except Exception as e:
-                    raise QPrmError("Could not parse line '{}'".format(line))
-
-                bond = _PrmBond(a_types, fc, r0)
-                prms["bonds"].append(bond)
-
-            # get the angle types
-            while True:
-                line = parmf.readline().strip()
-                if not line: break
-                try:
-                    a_types = line[0:2], line[3:5], line[6:8]
-                    a_types = [x.strip().replace("*", "star") for x in a_types]
-                    fc, t0 = float(line[8:18]), float(line[18:28])
-                    fc *= 2   # In Q the fc is divided by 2
-                except Exception as e:
-                    raise QPrmError("Could not parse line '{}'".format(line))
-
-                angle = _PrmAngle(a_types, fc, t0)
-                prms["angles"].append(angle)
-
-            # get the torsion (dihedral) types
-            mult_prev = 1
-            while True:
-                line = parmf.readline().strip()
-                if not line: break
-                try:
-                    a_types = line[0:2], line[3:5], line[6:8], line[9:11]
-                    a_types = [x.strip().replace("*", "star") for x in a_types]
-                    a_types = ["?" if x == "X" else x for x in a_types]
-                    npaths = float(line[11:15])
-                    fc, phase = float(line[15:30]), float(line[30:45])
-                    try:
-                        multiplicity = float(line[45:60])
-                    except ValueError:  # some amber parm files are shit
-                        multiplicity = float(line[45:55])
-                except Exception as e:
-                    raise QPrmError("Could not parse line '{}'".format(line))
-
-                prm_id = _PrmTorsion.get_id(a_types)
-
-                # torsion parameters belonging to the same torsion
-                # should be sequential, with leading negative 
-                # multiplicities/periodicities
-                if prms["torsions"] \
-                        and prms["torsions"][-1].prm_id == prm_id \
-                        and mult_prev < 0:
-                    torsion = prms["torsions"][-1]
-                else:
-                    torsion = _PrmTorsion(a_types)
-                    prms["torsions"].append(torsion)
-                mult_prev = multiplicity
-
-                try:
-                    # store the absolute value of the multiplicity 
-                    # since Q evaluates the sign in the energy expression
-                    # (while Amber does not)
-                    torsion.add_prm(fc,
-                                    abs(multiplicity),
-                                    phase,
-                                    npaths)
-                # in case of two parms sharing same multiplicity
-                except ValueError:
-                    raise QPrmError("Duplicate parameter found: {}"
-                                    .format(torsion))
-
-
-            # get the improper types
-            while True:
-                line = parmf.readline().strip()
-                if not line: break
-                try:
-                    a_types = line[0:2], line[3:5], line[6:8], line[9:11]
-                    a_types = [x.strip().replace("*", "star") for x in a_types]
-                    a_types = ["?" if x == "X" else x for x in a_types]
-                    center_atom = a_types.pop(2)
-
-                    fc, phi0 = float(line[15:30]), float(line[30:45])
-                    try:
-                        multiplicity = float(line[45:60])
-                    except ValueError:  # some amber parm files are shit
-                        multiplicity = float(line[45:55])
-
-                except Exception as e:
-                    raise QPrmError("Could not parse line '{}'".format(line))
-
-                improper = _PrmImproper(center_atom, a_types, fc,
-                                        phi0, multiplicity=multiplicity)
-                prms["impropers"].append(improper)
+            self._read_amber_bonds(parmf, prms)
+            self._read_amber_angles(parmf, prms)
+            self._read_amber_torsions(parmf, prms)
+            self._read_amber_impropers(parmf, prms)
 
             # two useless lines
             parmf.readline()
@@ -436,34 +432,9 @@ class QPrm(object):
             # another useless line  (MOD4 RE)
             parmf.readline()
 
-            # get the nonbonding parameters
-            while True:
-                line = parmf.readline().split()
-                if not line: break
-                try:
-                    a_type = line[0].replace("*", "star")
-                    same_a_types = same_types.get(a_type, [a_type,])
-                    lj_R, lj_eps = map(float, line[1:3])
-                except Exception as e:
-                    raise QPrmError("Could not parse line '{}'".format(line))
-
-                try:
-                    mass = self.amber_masses[a_type]
-                except KeyError:
-                    raise QPrmError("No mass for atom type: {}".format(a_type))
-
-                for a_type in same_a_types:
-                    atom_type = _PrmAtom(a_type, mass, lj_R=lj_R, lj_eps=lj_eps)
-                    prms["atoms"].append(atom_type)
+            self._read_amber_nonbonded(parmf, prms, same_types)
 
-
-        dups = []
-        for type_, params in six.iteritems(prms):
-            for prm in params:
-                dup = self._add_prm(prm)
-                if dup != None:
-                    dups.append(dup)
-        return dups
+        return self._add_prms(prms)
 
 
     def read_amber_frcmod(self, frcmodfile):
@@ -493,160 +464,179 @@ class QPrm(object):
                 "torsions": [],
                 "impropers": []}
 
-        with open(frcmodfile) as parmf:
+        with open(frcmodfile, encoding=_AMBER_ENCODING) as parmf:
             # line with FF description
             parmf.readline()
 
-            # get the masses
             parmf.readline()    # MASS
-            while True:
-                line = parmf.readline().split()
-                if not line: break
-                try:
-                    atom_name, mass = line[0].replace("*", "star"), float(line[1])
-                except Exception as e:
-                    raise QPrmError("Could not parse line '{}'".format(line))
-                try:
-                    old_mass = self.amber_masses[atom_name]
-                except KeyError:
-                    self.amber_masses[atom_name] = mass
-                else:
-                    if abs(mass - old_mass) > 0.00001:
-                        raise QPrmError("Different masses for same type ({}): "
-                                        "{}, {}".format(atom_name, mass,
-                                                        old_mass))
-
-            # get the bond types
+            # (different masses for the same type are always an error here)
+            self._read_amber_masses(parmf, ignore_errors=False)
             parmf.readline()    # BOND
-            while True:
-                line = parmf.readline().strip()
-                if not line: break
-                try:
-                    a_types = line[0:2], line[3:5]
-                    a_types = [x.strip().replace("*", "star") for x in a_types]
-                    fc, r0 = float(line[5:15]), float(line[15:25])
-                    fc *= 2   # In Q the fc is divided by 2
-                except Exception as e:
-                    raise QPrmError("Could not parse line '{}'".format(line))
-
-                bond = _PrmBond(a_types, fc, r0)
-                prms["bonds"].append(bond)
-
-            # get the angle types
+            self._read_amber_bonds(parmf, prms)
             parmf.readline()    # ANGL
-            while True:
-                line = parmf.readline().strip()
-                if not line: break
-                try:
-                    a_types = line[0:2], line[3:5], line[6:8]
-                    a_types = [x.strip().replace("*", "star") for x in a_types]
-                    fc, t0 = float(line[8:18]), float(line[18:28])
-                    fc *= 2   # In Q the fc is divided by 2
-                except Exception as e:
-                    raise QPrmError("Could not parse line '{}'".format(line))
-
-                angle = _PrmAngle(a_types, fc, t0)
-                prms["angles"].append(angle)
-
-            # get the torsion (dihedral) types
+            self._read_amber_angles(parmf, prms)
             parmf.readline()    # DIHE
-            mult_prev = 1
-            while True:
-                line = parmf.readline().strip()
-                if not line: break
-                try:
-                    a_types = line[0:2], line[3:5], line[6:8], line[9:11]
-                    a_types = [x.strip().replace("*", "star") for x in a_types]
-                    a_types = ["?" if x == "X" else x for x in a_types]
-                    npaths = float(line[11:15])
-                    fc, phase = float(line[15:30]), float(line[30:45])
-                    try:
-                        multiplicity = float(line[45:60])
-                    except ValueError:  # some amber parm files are shit
-                        multiplicity = float(line[45:55])
-                except Exception as e:
-                    raise QPrmError("Could not parse line '{}'".format(line))
-
-                prm_id = _PrmTorsion.get_id(a_types)
-                # torsion parameters belonging to the same torsion
-                # should be sequential, with leading negative 
-                # multiplicities/periodicities
-                if prms["torsions"] \
-                        and prms["torsions"][-1].prm_id == prm_id \
-                        and mult_prev < 0:
-                    torsion = prms["torsions"][-1]
-                else:
-                    torsion = _PrmTorsion(a_types)
-                    prms["torsions"].append(torsion)
-
-                mult_prev = multiplicity
-
-                try:
-                    # store the absolute value of the multiplicity 
-                    # since Q evaluates the sign in the energy expression
-                    # (while Amber does not)
-                    torsion.add_prm(fc,
-                                    abs(multiplicity),
-                                    phase,
-                                    npaths)
-                # in case of two parms sharing same multiplicity
-                except ValueError:
-                    raise QPrmError("Duplicate parameter found: {}"
-                                    .format(torsion))
-
-
-            # get the improper types
+            self._read_amber_torsions(parmf, prms)
             parmf.readline()    # IMPR
-            while True:
-                line = parmf.readline().strip()
-                if not line: break
+            self._read_amber_impropers(parmf, prms)
+            parmf.readline()    # NONB
+            self._read_amber_nonbonded(parmf, prms)
+
+        return self._add_prms(prms)
+
+
+    # Readers of the blocks of Amber parm and frcmod files, shared by
+    # read_amber_parm and read_amber_frcmod. Each reads lines from the
+    # open file 'parmf' up to and including the blank line that ends
+    # the block, and appends the parameters to the lists in 'prms'.
+
+    def _read_amber_masses(self, parmf, ignore_errors):
+        # masses are stored directly in QPrm.amber_masses
+        while True:
+            line = parmf.readline().split()
+            if not line: break
+            try:
+                atom_name = intern(line[0].replace("*", "star"))
+                mass = float(line[1])
+            except Exception as e:
+                raise QPrmError("Could not parse line '{}'".format(line))
+            try:
+                old_mass = self.amber_masses[atom_name]
+            except KeyError:
+                self.amber_masses[atom_name] = mass
+            else:
+                if abs(mass - old_mass) > 0.00001:
+                    raise_or_log("Different masses for same type ({}): "
+                                 "{}, {}"
+                                 .format(atom_name, mass, old_mass),
+                                 QPrmError, logger, ignore_errors)
+
+
+    def _read_amber_bonds(self, parmf, prms):
+        while True:
+            line = parmf.readline().strip()
+            if not line: break
+            try:
+                a1, a2, fc, r0 = _AMBER_BOND_COLS(line)
+                a_types = _amber_atom_types(line, (a1, a2))
+                fc, r0 = float(fc), float(r0)
+                fc *= 2   # In Q the fc is divided by 2
+            except Exception as e:
+                raise QPrmError("Could not parse line '{}'".format(line))
+
+            bond = _PrmBond(a_types, fc, r0)
+            prms["bonds"].append(bond)
+
+
+    def _read_amber_angles(self, parmf, prms):
+        while True:
+            line = parmf.readline().strip()
+            if not line: break
+            try:
+                a1, a2, a3, fc, t0 = _AMBER_ANGLE_COLS(line)
+                a_types = _amber_atom_types(line, (a1, a2, a3))
+                fc, t0 = float(fc), float(t0)
+                fc *= 2   # In Q the fc is divided by 2
+            except Exception as e:
+                raise QPrmError("Could not parse line '{}'".format(line))
+
+            angle = _PrmAngle(a_types, fc, t0)
+            prms["angles"].append(angle)
+
+
+    def _read_amber_torsions(self, parmf, prms):
+        mult_prev = 1
+        while True:
+            line = parmf.readline().strip()
+            if not line: break
+            try:
+                fields = _AMBER_TORSION_COLS(line)
+                a_types = _amber_atom_types(line, fields[0:4])
+                a_types = ["?" if x == "X" else x for x in a_types]
+                npaths, fc, phase = map(float, fields[4:7])
                 try:
-                    a_types = line[0:2], line[3:5], line[6:8], line[9:11]
-                    a_types = [x.strip().replace("*", "star") for x in a_types]
-                    a_types = ["?" if x == "X" else x for x in a_types]
-                    center_atom = a_types.pop(2)
-
-                    fc, phi0 = float(line[15:30]), float(line[30:45])
-                    try:
-                        multiplicity = float(line[45:60])
-                    except ValueError:  # some amber parm files are shit
-                        multiplicity = float(line[45:55])
-
-                except Exception as e:
-                    raise QPrmError("Could not parse line '{}'".format(line))
-
-                improper = _PrmImproper(center_atom, a_types, fc, phi0,
-                                        multiplicity=multiplicity)
-                prms["impropers"].append(improper)
+                    multiplicity = float(line[45:60])
+                except ValueError:  # some amber parm files are shit
+                    multiplicity = float(line[45:55])
+            except Exception as e:
+                raise QPrmError("Could not parse line '{}'".format(line))
+
+            prm_id = _PrmTorsion.get_id(a_types)
+
+            # torsion parameters belonging to the same torsion
+            # should be sequential, with leading negative 
+            # multiplicities/periodicities
+            if prms["torsions"] \
+                    and prms["torsions"][-1].prm_id == prm_id \
+                    and mult_prev < 0:
+                torsion = prms["torsions"][-1]
+            else:
+                torsion = _PrmTorsion(a_types)
+                prms["torsions"].append(torsion)
+            mult_prev = multiplicity
+
+            try:
+                # store the absolute value of the multiplicity 
+                # since Q evaluates the sign in the energy expression
+                # (while Amber does not)
+                torsion.add_prm(fc,
+                                abs(multiplicity),
+                                phase,
+                                npaths)
+            # in case of two parms sharing same multiplicity
+            except ValueError:
+                raise QPrmError("Duplicate parameter found: {}"
+                                .format(torsion))
+
+
+    def _read_amber_impropers(self, parmf, prms):
+        while True:
+            line = parmf.readline().strip()
+            if not line: break
+            try:
+                fields = _AMBER_TORSION_COLS(line)
+                a_types = _amber_atom_types(line, fields[0:4])
+                a_types = ["?" if x == "X" else x for x in a_types]
+                center_atom = a_types.pop(2)
+
+                fc, phi0 = map(float, fields[5:7])
+                try:
+                    multiplicity = float(line[45:60])
+                except ValueError:  # some amber parm files are shit
+                    multiplicity = float(line[45:55])
 
+            except Exception as e:
+                raise QPrmError("Could not parse line '{}'".format(line))
 
-            # get the nonbonded parameters
-            parmf.readline()    # NONB
-            while True:
-                line = parmf.readline().split()
-                if not line: break
-                try:
-                    a_type = line[0].replace("*", "star")
-                    lj_R, lj_eps = map(float, line[1:3])
-                except Exception as e:
-                    raise QPrmError("Could not parse line '{}'".format(line))
+            improper = _PrmImproper(center_atom, a_types, fc,
+                                    phi0, multiplicity=multiplicity)
+            prms["impropers"].append(improper)
 
-                try:
-                    mass = self.amber_masses[a_type]
-                except KeyError:
-                    raise QPrmError("No mass for atom type: {}".format(a_type))
 
+    def _read_amber_nonbonded(self, parmf, prms, same_types=None):
+        # 'same_types' maps atom types to lists of types sharing
+        # their nonbonded parameters (parm files only)
+        if same_types is None:
+            same_types = {}
+        while True:
+            line = parmf.readline().split()
+            if not line: break
+            try:
+                a_type = intern(line[0].replace("*", "star"))
+                same_a_types = same_types.get(a_type, [a_type,])
+                lj_R, lj_eps = map(float, line[1:3])
+            except Exception as e:
+                raise QPrmError("Could not parse line '{}'".format(line))
+
+            try:
+                mass = self.amber_masses[a_type]
+            except KeyError:
+                raise QPrmError("No mass for atom type: {}".format(a_type))
+
+            for a_type in same_a_types:
                 atom_type = _PrmAtom(a_type, mass, lj_R=lj_R, lj_eps=lj_eps)
                 prms["atoms"].append(atom_type)
 
-        dups = []
-        for type_, params in six.iteritems(prms):
-            for prm in params:
-                dup = self._add_prm(prm)
-                if dup != None:
-                    dups.append(dup)
-        return dups
-
 
     def read_ffld(self, ffld_file, qstruct):
         """
@@ -680,7 +670,7 @@ class QPrm(object):
         # keys are ffld atom names, values are atom_types ("resname.atname")
         lookup_aname = {}
 
-        section = None
+        parse_line = None   # parser of lines in current section
 
         prms = {"atoms": [],
                 "bonds": [],
@@ -688,215 +678,294 @@ class QPrm(object):
                 "torsions": [],
                 "impropers": []}
 
-        for line in open(ffld_file, 'r').readlines():
-            line = line.strip()
-            if (line == "") or ("------" in line):
-                continue
-            elif line.startswith("atom   type  vdw  symbol"):
-                section = "ATOMS"
-                continue
-            elif line.startswith("Stretch            k"):
-                section = "BONDS"
-                continue
-            elif line.startswith("Bending                      k"):
-                section = "ANGLES"
-                continue
-            elif line.startswith("proper Torsion"):
-                section = "TORSIONS"
-                continue
-            elif line.startswith("improper"):
-                section = "IMPROPERS"
+        with open(ffld_file, 'r') as ffld:
+            for line in ffld:
+                line = line.strip()
+                if (line == "") or ("------" in line):
+                    continue
+                elif line.startswith(_FFLD_HEADER_PREFIXES):
+                    for prefix, section in _FFLD_SECTION_HEADERS:
+                        if line.startswith(prefix):
+                            break
+                    parse_line = self._ffld_section_parsers[section]
+                elif parse_line is not None:
+                    parse_line(line, prms, lookup_aname, qstruct)
+
+        return self._add_prms(prms)
+
+
+    # Parsers of single lines in the sections of FFLD files, used by
+    # read_ffld (see QPrm._ffld_section_parsers).
+    # The parsed parameters are appended to the lists in 'prms',
+    # 'lookup_aname' maps FFLD atom names to the created atom types.
+
+    #
+    #  C1      135  C1   CT      -0.0175   3.5000   0.0660 high   C: alkanes
+    #
+    def _parse_ffld_atom(self, line, prms, lookup_aname, qstruct):
+        lf = line.split()
+        try:
+            name, type_, vdw, symbol = lf[0:4]
+            charge, sigma, epsilon = float(lf[4]), float(lf[5]), float(lf[6])
+            if self.keep_comments:
+                comment = "FFLD: {}_{}_{} {}".format(symbol, vdw, type_,
+                                                     " ".join(lf[8:]))
+            else:
+                comment = None
+        except Exception:
+            raise QPrmError("Could not parse line: '{}'"
+                            .format(line))
+
+        # A_i = sqrt(4*eps*sigma^12), B_i = sqrt(4*eps*sigma^6)
+        sqrt_4eps = 2 * math.sqrt(epsilon)
+        sigma3 = sigma * sigma * sigma
+        lj_B_i = sqrt_4eps * sigma3
+        lj_A_i = lj_B_i * sigma3
+
+        element = vdw.translate(_DELETE_NON_ALPHA)
+        try:
+            mass = ATOM_MASSES[element.upper()]
+        except KeyError:
+            logger.warning("Mass for element '{}' (atom '{}') "
+                           "not found, set it manually."
+                           .format(element, name))
+            mass = "<FIX>"
+
+        aindex_struct = len(lookup_aname)
+        atom_struct = qstruct.atoms[aindex_struct]
+        residue_struct = atom_struct.residue
+
+        # check if element from ffld matches the one in the structure
+        # (just the first letters)
+        if name[0].lower() != atom_struct.name[0].lower():
+            raise_or_log("Atom element mismatch, possible wrong "
+                         "order of atoms: '{}' (struct) '{}' (ffld)"
+                         .format(atom_struct.name, name),
+                         QPrmError, logger, self.ignore_errors)
+
+        # make unique atom_type
+        atom_name = atom_struct.name
+        residue_name = residue_struct.name.lower()
+        atype = intern("{}.{}".format(residue_name, atom_name))
+
+        # make PrmAtom
+        atom_type = _PrmAtom(atype, mass,
+                             lj_A=lj_A_i, lj_B=lj_B_i,
+                             comment=comment)
+        prms["atoms"].append(atom_type)
+
+        # add atom name: atom type
+        lookup_aname[name] = atype
+
+    #
+    #  C1      H2      340.00000    1.09000   high      140  0   CT  -HC    ==> CT  -HC
+    #
+    def _parse_ffld_bond(self, line, prms, lookup_aname, qstruct):
+        lf = line.split()
+        try:
+            anames = lf[0:2]
+            fc, r0 = float(lf[2]), float(lf[3])
+            comment = ("FFLD: " + " ".join(lf[4:])
+                       if self.keep_comments else None)
+        except Exception as e:
+            raise QPrmError("Could not parse line: '{}'"
+                            .format(line))
+
+        atypes = list(map(lookup_aname.__getitem__, anames))
+        bond = _PrmBond(atypes, fc*2.0, r0, comment=comment)
+        prms["bonds"].append(bond)
+
+    #
+    #  H2      C1      H3        33.00000  107.80000   high      ...
+    #
+    def _parse_ffld_angle(self, line, prms, lookup_aname, qstruct):
+        lf = line.split()
+        try:
+            anames = lf[0:3]
+            fc, theta0 = float(lf[3]), float(lf[4])
+            comment = ("FFLD: " + " ".join(lf[5:])
+                       if self.keep_comments else None)
+        except Exception as e:
+            raise QPrmError("Could not parse line: '{}'"
+                            .format(line))
+
+        atypes = list(map(lookup_aname.__getitem__, anames))
+        angle = _PrmAngle(atypes, fc*2.0, theta0, comment=comment)
+        prms["angles"].append(angle)
+
+    #
+    #  O2      P1      O3      C4        0.000   0.000   0.562   0.000    high ...
+    #
+    def _parse_ffld_torsion(self, line, prms, lookup_aname, qstruct):
+        lf = line.split()
+        try:
+            anames = lf[0:4]
+            fcs = (float(lf[4]), float(lf[5]), float(lf[6]), float(lf[7]))
+            comment = ("FFLD: " + " ".join(lf[8:])
+                       if self.keep_comments else None)
+        except Exception as e:
+            raise QPrmError("Could not parse line: '{}'"
+                            .format(line))
+
+        atypes = list(map(lookup_aname.__getitem__, anames))
+        torsion = _PrmTorsion(atypes, comment=comment)
+        for fc, mult, phi0, path in zip(fcs, _FFLD_TORSION_MULTS,
+                                        _FFLD_TORSION_PHI0S,
+                                        _FFLD_TORSION_PATHS):
+            if abs(fc) > 0.000001:
+                torsion.add_prm(fc/2.0, mult, phi0, path)
+        if not torsion.get_prms():
+            torsion.add_prm(0.0, 1.0, 0.0, 1.0)
+        prms["torsions"].append(torsion)
+
+    #
+    #  C21     C22     C20     O19       2.200   high   ...
+    #
+    def _parse_ffld_improper(self, line, prms, lookup_aname, qstruct):
+        lf = line.split()
+        try:
+            anames = lf[0:4]
+            fc = float(lf[4])
+            comment = ("FFLD: " + " ".join(lf[5:])
+                       if self.keep_comments else None)
+        except Exception as e:
+            raise QPrmError("Could not parse line: '{}'"
+                            .format(line))
+
+        atypes = list(map(lookup_aname.__getitem__, anames))
+        center_atom = atypes.pop(2)
+        improper = _PrmImproper(center_atom, atypes, fc/2.0,
+                                180.0, multiplicity=2, comment=comment)
+        prms["impropers"].append(improper)
+
+
+
+    def _add_prms(self, prms):
+        # add the parameters returned by the parsers (lists of
+        # _PrmAtom/Bond/... in dict 'prms', see read_prm) and return
+        # the list of overwritten parameters.
+        # If none of the parameters of a kind collide with each other
+        # or with the stored ones, they are simply merged into the
+        # dictionaries, otherwise each is checked by _add_prm.
+        dups = []
+        for kind, params in prms.items():
+            prm_dict, generic_dict = self._prm_dicts[kind]
+            new_prms = {}
+            new_generic_prms = {}
+            for prm in params:
+                if generic_dict is not None and prm.is_generic:
+                    new_generic_prms[prm.prm_id] = prm
+                else:
+                    new_prms[prm.prm_id] = prm
+
+            if len(new_prms) + len(new_generic_prms) == len(params) \
+                    and new_prms.keys().isdisjoint(prm_dict) \
+                    and (generic_dict is None or \
+                         new_generic_prms.keys().isdisjoint(generic_dict)):
+                prm_dict.update(new_prms)
+                if generic_dict is not None:
+                    generic_dict.update(new_generic_prms)
                 continue
 
-#
-#  C1      135  C1   CT      -0.0175   3.5000   0.0660 high   C: alkanes
-#
-            if section == "ATOMS":
-                lf = line.split()
-                try:
-                    name, type_, vdw, symbol = lf[0:4]
-                    charge, sigma, epsilon = map(float, lf[4:7])
-                    comment = "FFLD: {}_{}_{} {}".format(symbol, vdw, type_,
-                                                         " ".join(lf[8:]))
-                except Exception:
-                    raise QPrmError("Could not parse line: '{}'"
-                                    .format(line))
-
-                lj_A_i = (4 * epsilon * sigma**12)**0.5
-                lj_B_i = (4 * epsilon * sigma**6)**0.5
-
-                element = "".join(c for c in vdw if c.isalpha())
-                try:
-                    mass = ATOM_MASSES[element.upper()]
-                except KeyError:
-                    logger.warning("Mass for element '{}' (atom '{}') "
-                                   "not found, set it manually."
-                                   .format(element, name))
-                    mass = "<FIX>"
-
-                aindex_struct = len(lookup_aname)
-                atom_struct = qstruct.atoms[aindex_struct]
-                residue_struct = atom_struct.residue
-
-                # check if element from ffld matches the one in the structure
-                # (just the first letters)
-                if name[0].lower() != atom_struct.name[0].lower():
-                    raise_or_log("Atom element mismatch, possible wrong "
-                                 "order of atoms: '{}' (struct) '{}' (ffld)"
-                                 .format(atom_struct.name, name),
-                                 QPrmError, logger, self.ignore_errors)
-
-                # make unique atom_type
-                atom_name = atom_struct.name
-                residue_name = residue_struct.name.lower()
-                atype = "{}.{}".format(residue_name, atom_name)
-
-                # make PrmAtom
-                atom_type = _PrmAtom(atype, mass,
-                                     lj_A=lj_A_i, lj_B=lj_B_i,
-                                     comment=comment)
-                prms["atoms"].append(atom_type)
-
-                # add atom name: atom type
-                lookup_aname[name] = atype
-
-#
-#  C1      H2      340.00000    1.09000   high      140  0   CT  -HC    ==> CT  -HC
-#
-            if section == "BONDS":
-                lf = line.split()
-                try:
-                    anames = lf[0:2]
-                    fc, r0 = map(float, lf[2:4])
-                    comment = "FFLD: " + " ".join(lf[4:])
-                except Exception as e:
-                    raise QPrmError("Could not parse line: '{}'"
-                                    .format(line))
-
-                atypes = [lookup_aname[name] for name in anames]
-                bond = _PrmBond(atypes, fc*2.0, r0, comment=comment)
-                prms["bonds"].append(bond)
-
-#
-#  H2      C1      H3        33.00000  107.80000   high      ...
-#
-            if section == "ANGLES":
-                lf = line.split()
-                try:
-                    anames = lf[0:3]
-                    fc, theta0 = map(float, lf[3:5])
-                    comment = "FFLD: " + " ".join(lf[5:])
-                except Exception as e:
-                    raise QPrmError("Could not parse line: '{}'"
-                                    .format(line))
-
-                atypes = [lookup_aname[name] for name in anames]
-                angle = _PrmAngle(atypes, fc*2.0, theta0, comment=comment)
-                prms["angles"].append(angle)
-
-#
-#  O2      P1      O3      C4        0.000   0.000   0.562   0.000    high ...
-#
-            if section == "TORSIONS":
-                lf = line.split()
-                try:
-                    anames = lf[0:4]
-                    fcs = list(map(float, lf[4:8]))
-                    comment = "FFLD: " + " ".join(lf[8:])
-                except Exception as e:
-                    raise QPrmError("Could not parse line: '{}'"
-                                    .format(line))
-
-                # Mult. signs in Q don't actually matter
-                # for reading the torsion parameters.
-                # Let's stick to positive values.
-                # (Q also evaluates the sign in the energies.
-                # Fortunately, prms with phi0=0/180 are not 
-                # affected)
-                multiplicity = (1.0, 2.0, 3.0, 4.0)
-                phi0s = (0.0, 180.0, 0.0, 180.0)
-                paths = (1.0, 1.0, 1.0, 1.0)
-
-                atypes = [lookup_aname[name] for name in anames]
-                torsion = _PrmTorsion(atypes, comment=comment)
-                for fc, mult, phi0, path in zip(fcs, multiplicity, phi0s, paths):
-                    if abs(fc) > 0.000001:
-                        torsion.add_prm(fc/2.0, mult, phi0, path)
-                if not torsion.get_prms():
-                    torsion.add_prm(0.0, 1.0, 0.0, 1.0)
-                prms["torsions"].append(torsion)
-
-#
-#  C21     C22     C20     O19       2.200   high   ...
-#
-            if section == "IMPROPERS":
-                lf = line.split()
-                try:
-                    anames = lf[0:4]
-                    fc = float(lf[4])
-                    comment = "FFLD: " + " ".join(lf[5:])
-                except Exception as e:
-                    raise QPrmError("Could not parse line: '{}'"
-                                    .format(line))
-
-                atypes = [lookup_aname[name] for name in anames]
-                center_atom = atypes.pop(2)
-                improper = _PrmImproper(center_atom, atypes, fc/2.0,
-                                        180.0, multiplicity=2, comment=comment)
-                prms["impropers"].append(improper)
-
-        dups = []
-        for type_, params in six.iteritems(prms):
             for prm in params:
-                dup = self._add_prm(prm)
+                if generic_dict is not None and prm.is_generic:
+                    dup = self._add_prm(prm, generic_dict)
+                else:
+                    dup = self._add_prm(prm, prm_dict)
                 if dup != None:
                     dups.append(dup)
         return dups
 
 
-
-    def _add_prm(self, prm):
-        # add the parameter 'prm' to the approprate dictionary
-        # Depending on the value of QPrm.ignore_errors:
-        #   True - overwrite parameter types with different values
-        #   False - raise QPrmError
+    def _get_prm_dict(self, prm):
+        # return the dictionary where parameter 'prm' belongs
         if isinstance(prm, _PrmAtom):
-            prm_dict = self.atom_types
+            return self.atom_types
         elif isinstance(prm, _PrmBond):
-            prm_dict = self.bonds
+            return self.bonds
         elif isinstance(prm, _PrmAngle):
-            prm_dict = self.angles
+            return self.angles
         elif isinstance(prm, _PrmTorsion):
             if prm.is_generic:
-                prm_dict = self.generic_torsions
+                return self.generic_torsions
             else:
-                prm_dict = self.torsions
+                return self.torsions
         elif isinstance(prm, _PrmImproper):
             if prm.is_generic:
-                prm_dict = self.generic_impropers
+                return self.generic_impropers
             else:
-                prm_dict = self.impropers
+                return self.impropers
         else:
             raise TypeError("'prm' is not of type "
                             "_PrmAtom/Bond/Angle/Torsion/Improper")
 
+
+    def _add_prm(self, prm, prm_dict=None):
+        # add the parameter 'prm' to the approprate dictionary
+        # (found from its type, unless given in 'prm_dict')
+        # Depending on the value of QPrm.ignore_errors:
+        #   True - overwrite parameter types with different values
+        #   False - raise QPrmError
+        if prm_dict is None:
+            prm_dict = self._get_prm_dict(prm)
+
         old_prm = None
-        if prm.prm_id in prm_dict:
-            sa1 = str(prm)
-            sa2 = str(prm_dict[prm.prm_id])
-            if sa1 != sa2:
+        existing_prm = prm_dict.get(prm.prm_id)
+        if existing_prm is not None:
+            # compare the values at the precision of their strvals
+            if prm._value_key != existing_prm._value_key:
                 raise_or_log("Same parameter types with different "
                              "value (could also be due to non-sequential "
-                             "torsion parameters):\n{}\n{}".format(sa1, sa2),
+                             "torsion parameters):\n{}\n{}"
+                             .format(prm, existing_prm),
                              QPrmError, logger, self.ignore_errors)
-                old_prm = prm_dict[prm.prm_id]
+                old_prm = existing_prm
             else:
                 logger.warning("Removing duplicate parameter "
-                               ":\n{}".format(sa1))
+                               ":\n{}".format(prm))
         prm_dict[prm.prm_id] = prm
         return old_prm
 
 
+    def get_bond_arrays(self):
+        """Return the bond parameters as parallel (columnar) arrays.
+
+        Returns:
+            prm_ids (list):  bond identifiers (keys of QPrm.bonds)
+            fcs (array.array):  force constants ('d' typecode)
+            r0s (array.array):  equilibrium distances ('d' typecode)
+
+        The arrays are in the same order as QPrm.bonds and are
+        meant for consumers that process all bonds in bulk
+        (eg. wrapped with numpy.frombuffer).
+        """
+        prm_ids = list(self.bonds.keys())
+        fcs = array("d", (b.fc for b in self.bonds.values()))
+        r0s = array("d", (b.r0 for b in self.bonds.values()))
+        return prm_ids, fcs, r0s
+
+
+    def get_atom_type_arrays(self):
+        """Return the atom type LJ parameters as parallel (columnar) arrays.
+
+        Returns:
+            prm_ids (list):  atom types (keys of QPrm.atom_types)
+            lj_1 (array.array):  lj_R (amber) or lj_A (oplsaa) parameters
+            lj_2 (array.array):  lj_eps (amber) or lj_B (oplsaa) parameters
+
+        The arrays ('d' typecode) are in the same order as QPrm.atom_types,
+        see get_bond_arrays.
+        """
+        if self.ff_type == "amber":
+            lj_1, lj_2 = attrgetter("lj_R"), attrgetter("lj_eps")
+        else:
+            lj_1, lj_2 = attrgetter("lj_A"), attrgetter("lj_B")
+        prm_ids = list(self.atom_types.keys())
+        lj_1s = array("d", map(lj_1, self.atom_types.values()))
+        lj_2s = array("d", map(lj_2, self.atom_types.values()))
+        return prm_ids, lj_1s, lj_2s
+
+
 
 
 
@@ -914,127 +983,117 @@ class QPrm(object):
                            bonds=[_PrmBond, _PrmBond, _PrmBond],\
                            angles=[], torsions=[], impropers=[])
         """
-        
-        prm_l = {"options": [],
-                 "atom_types": [],
-                 "bonds": [],
-                 "angles": [],
-                 "torsions": [],
-                 "impropers": []}
+        prmstr = io.StringIO()
+        self.write_to(prmstr, atom_types=atom_types, bonds=bonds,
+                      angles=angles, torsions=torsions, impropers=impropers)
+        return prmstr.getvalue()
+
+
+    def write_to(self, fileobj, atom_types=None, bonds=None,
+                 angles=None, torsions=None, impropers=None):
+        """Write the Q parameter file to an open file object.
 
+        Same as get_string, but the lines are written out as they are
+        formatted instead of being returned as one string.
+
+        Examples:
+            >>> with open("qoplsaa.prm", "w") as prmfile:
+            ...     qprm.write_to(prmfile)
+        """
         gentorsions = []
         genimpropers = []
 
+        # parameters stored in QPrm are unique (keyed by prm_id),
+        # the lists given as arguments might contain duplicates
         if atom_types == None:
-            atom_types = list(self.atom_types.values())
+            atom_types = self.atom_types.values()
+        else:
+            atom_types = set(atom_types)
         if bonds == None:
-            bonds = list(self.bonds.values())
+            bonds = self.bonds.values()
+        else:
+            bonds = set(bonds)
         if angles == None:
-            angles = list(self.angles.values())
+            angles = self.angles.values()
+        else:
+            angles = set(angles)
         if torsions == None:
-            gentorsions = list(self.generic_torsions.values())
-            torsions = list(self.torsions.values())
+            gentorsions = self.generic_torsions.values()
+            torsions = self.torsions.values()
+        else:
+            torsions = set(torsions)
         if impropers == None:
-            genimpropers = list(self.generic_impropers.values())
-            impropers = list(self.impropers.values())
-
-        for k, v in six.iteritems(self.options):
-            prm_l["options"].append("{:<30s} {:<s}".format(k, v))
-
-        for v in sorted(set(atom_types), key=lambda x: x.prm_id):
-            if self.ff_type == "amber":
-                prm_l["atom_types"].append("{:<12} {:>10} {:>10} "
-                                           "{:>10} {:>10} {:>10} "
-                                           "{:>10}{}"
-                                           .format(v.atom_type, v.lj_R, 0.0,
-                                                   v.lj_eps, v.lj_R,
-                                                   v.lj_eps/2, v.mass,
-                                                   v.comment))
-            elif self.ff_type == "oplsaa":
+            genimpropers = self.generic_impropers.values()
+            impropers = self.impropers.values()
+        else:
+            impropers = set(impropers)
+
+        # generic parameters with more wildcards come first
+        torsions = (sorted(gentorsions, key=_generic_sort_key)
+                    + sorted(torsions, key=_prm_id_key))
+        impropers = (sorted(genimpropers, key=_generic_sort_key)
+                     + sorted(impropers, key=_prm_id_key))
+
+        # generators of formatted lines
+        sections = (
+            ("options",
+             ("%-30s %s\n" % (k, v) for k, v in self.options.items())),
+            ("atom_types",
+             self._atom_type_lines(sorted(atom_types, key=_prm_id_key))),
+            ("bonds",
+             ("%-12s %-12s %10s %10s%s\n"
+              % (v.atom_types + (v.fc, v.r0, v.comment))
+              for v in sorted(bonds, key=_prm_id_key))),
+            ("angles",
+             ("%-12s %-12s %-12s %10s %10s%s\n"
+              % (v.atom_types + (v.fc, v.theta0, v.comment))
+              for v in sorted(angles, key=_prm_id_key))),
+            # (fc, multiplicity, phase, npaths) from get_prms
+            ("torsions",
+             ("%-12s %-12s %-12s %-12s %10s %5s %10s %5s%s\n"
+              % (v.atom_types + prm + (v.comment,))
+              for v in torsions for prm in v.get_prms())),
+            ("impropers",
+             ("%-12s %-12s %-12s %-12s %10s %10s%s\n"
+              % (v.atom_types + (v.fc, v.phi0, v.comment))
+              for v in impropers)))
+
+        write = fileobj.write
+        for i, (section, lines) in enumerate(sections):
+            # sections are separated by an empty line
+            if i:
+                write("\n")
+            write("[{}]\n".format(section))
+            empty = True
+            for line in lines:
+                write(line)
+                empty = False
+            if empty:
+                write("\n")
+
+
+    def _atom_type_lines(self, atom_types):
+        # generate the formatted [atom_types] lines (see write_to)
+        if self.ff_type == "amber":
+            for v in atom_types:
+                lj_R, lj_eps = v.lj_R, v.lj_eps
+                yield ("%-12s %10s %10s %10s %10s %10s %10s%s\n"
+                       % (v.atom_type, lj_R, 0.0, lj_eps, lj_R,
+                          lj_eps/2, v.mass, v.comment))
+        elif self.ff_type == "oplsaa":
+            for v in atom_types:
                 lj_A = round(v.lj_A, 4)
                 lj_B = round(v.lj_B, 4)
-                prm_l["atom_types"].append("{:<12} {:>10} {:>10} "
-                                           "{:>10} {:>10} {:>10} "
-                                           "{:>10}{}"
-                                           .format(v.atom_type, lj_A, lj_A,
-                                                   lj_B,
-                                                   round(lj_A/2**0.5, 4),
-                                                   round(lj_B/2**0.5, 4),
-                                                   v.mass, v.comment))
-
-        for v in sorted(set(bonds), key=lambda x: x.prm_id):
-            a1, a2 = v.atom_types
-            prm_l["bonds"].append("{:<12} {:<12} {:>10} {:>10}{}"
-                                  .format(a1, a2, v.fc, v.r0, v.comment))
-
-        for v in sorted(set(angles), key=lambda x: x.prm_id):
-            a1, a2, a3 = v.atom_types
-            prm_l["angles"].append("{:<12} {:<12} {:<12} {:>10} {:>10}{}"
-                                   .format(a1, a2, a3, v.fc, v.theta0,
-                                           v.comment))
-
-        # sorting function includes empty spaces before the prm_id so
-        # parameters with more wildcards come first
-        for v in sorted(set(gentorsions), key=lambda x: \
-                x.prm_id.count("?") * " " + x.prm_id):
-            a1, a2, a3, a4 = v.atom_types
-            for fc, multiplicity, phase, npaths in v.get_prms():
-                prm_l["torsions"].append("{:<12} {:<12} {:<12} {:<12} "
-                                         "{:>10} {:>5} {:>10} {:>5}{}"
-                                         .format(a1, a2, a3, a4, fc,
-                                                 multiplicity, phase, npaths,
-                                                 v.comment))
-
-        for v in sorted(set(torsions), key=lambda x: x.prm_id):
-            a1, a2, a3, a4 = v.atom_types
-            for fc, multiplicity, phase, npaths in v.get_prms():
-                prm_l["torsions"].append("{:<12} {:<12} {:<12} {:<12} "
-                                         "{:>10} {:>5} {:>10} {:>5}{}"
-                                         .format(a1, a2, a3, a4, fc,
-                                                 multiplicity, phase, npaths,
-                                                 v.comment))
-
-        # sorting function includes empty spaces before the prm_id so
-        # parameters with more wildcards come first
-        for v in sorted(set(genimpropers), key=lambda x: \
-                x.prm_id.count("?") * " " + x.prm_id):
-            a1, a2, a3, a4 = v.atom_types
-            prm_l["impropers"].append("{:<12} {:<12} {:<12} {:<12} "
-                                      "{:>10} {:>10}{}"
-                                      .format(a1, a2, a3, a4, v.fc,
-                                              v.phi0, v.comment))
-
-        for v in sorted(set(impropers), key=lambda x: x.prm_id):
-            a1, a2, a3, a4 = v.atom_types
-            prm_l["impropers"].append("{:<12} {:<12} {:<12} {:<12} "
-                                      "{:>10} {:>10}{}"
-                                      .format(a1, a2, a3, a4, v.fc,
-                                              v.phi0, v.comment))
-
-        for k in prm_l.keys():
-            prm_l[k] = "\n".join(prm_l[k])
-
-        return """[options]
-{options}
-
-[atom_types]
-{atom_types}
-
-[bonds]
-{bonds}
-
-[angles]
-{angles}
-
-[torsions]
-{torsions}
-
-[impropers]
-{impropers}
-""".format(**prm_l)
+                yield ("%-12s %10s %10s %10s %10s %10s %10s%s\n"
+                       % (v.atom_type, lj_A, lj_A, lj_B,
+                          round(lj_A/2**0.5, 4), round(lj_B/2**0.5, 4),
+                          v.mass, v.comment))
 
 
 class _PrmAtom(object):
+    __slots__ = ("atom_type", "prm_id", "lj_A", "lj_B", "lj_R", "lj_eps",
+                 "mass", "comment")
+
     def __init__(self, atom_type, mass,
                  lj_A=None, lj_B=None,
                  lj_R=None, lj_eps=None,
@@ -1061,20 +1120,13 @@ class _PrmAtom(object):
         """
         # atom_type is a string like "CA" or "OW"
         self.atom_type = atom_type
-        self.prm_id = self.get_id(atom_type)
+        self.prm_id = intern(self.get_id(atom_type))
         self.lj_A = lj_A
         self.lj_B = lj_B
         self.lj_R = lj_R
         self.lj_eps = lj_eps
         self.mass = mass
-        self._comment = comment
-
-    @property
-    def comment(self):
-        if self._comment:
-            return " # {}".format(self._comment)
-        else:
-            return ""
+        self.comment = " # {}".format(comment) if comment else ""
 
     def __repr__(self):
         return "_PrmAtom({}, {})".format(self.prm_id, self.strval)
@@ -1088,6 +1140,13 @@ class _PrmAtom(object):
             prms = "lj_R={:.3f}, lj_eps={:.3f}".format(self.lj_R, self.lj_eps)
         return "{}, mass={:.3f}".format(prms, self.mass)
 
+    @property
+    def _value_key(self):
+        if self.lj_A != None:
+            prms = (round(self.lj_A, 3), round(self.lj_B, 3))
+        else:
+            prms = (round(self.lj_R, 3), round(self.lj_eps, 3))
+        return prms + (round(self.mass, 3),)
 
     @staticmethod
     def get_id(atom_type):
@@ -1096,19 +1155,14 @@ class _PrmAtom(object):
 
 
 class _PrmBond(object):
+    __slots__ = ("fc", "r0", "prm_id", "atom_types", "comment")
+
     def __init__(self, atom_types, fc, r0, comment=None):
         self.fc = fc
         self.r0 = r0
-        self.prm_id = self.get_id(atom_types)
-        self.atom_types = self.prm_id.split()   # list of atom_type strings
-        self._comment = comment
-
-    @property
-    def comment(self):
-        if self._comment:
-            return " # {}".format(self._comment)
-        else:
-            return ""
+        self.atom_types = self.get_atom_types(atom_types)
+        self.prm_id = intern(" ".join(self.atom_types))
+        self.comment = " # {}".format(comment) if comment else ""
 
     def __repr__(self):
         return "_PrmBond({}, fc={:.3f}, r0={:.3f})".format(self.prm_id,
@@ -1119,28 +1173,32 @@ class _PrmBond(object):
         """Return parameter values in string format."""
         return "fc={:.3f}, r0={:.3f}".format(self.fc, self.r0)
 
+    @property
+    def _value_key(self):
+        return (round(self.fc, 3), round(self.r0, 3))
+
     @staticmethod
-    def get_id(atom_types):
-        """Return the unique identifier (sorted atom types)"""
+    def get_atom_types(atom_types):
+        """Return the atom types (tuple) in the order of the identifier"""
         # prm_id = atom_types - sorted, "CA CB" instead of "CB CA",
         # to prevent double entries
-        return " ".join(sorted(atom_types))
+        return tuple(sorted(atom_types))
+
+    @staticmethod
+    def get_id(atom_types):
+        """Return the unique identifier (sorted atom types)"""
+        return " ".join(_PrmBond.get_atom_types(atom_types))
 
 
 class _PrmAngle(object):
+    __slots__ = ("fc", "theta0", "prm_id", "atom_types", "comment")
+
     def __init__(self, atom_types, fc, theta0, comment=None):
         self.fc = fc
         self.theta0 = theta0
-        self.prm_id = self.get_id(atom_types)
-        self.atom_types = self.prm_id.split()
-        self._comment = comment
-
-    @property
-    def comment(self):
-        if self._comment:
-            return " # {}".format(self._comment)
-        else:
-            return ""
+        self.atom_types = self.get_atom_types(atom_types)
+        self.prm_id = intern(" ".join(self.atom_types))
+        self.comment = " # {}".format(comment) if comment else ""
 
     def __repr__(self):
         return "_PrmAngle({}, {})".format(self.prm_id, self.strval)
@@ -1150,24 +1208,42 @@ class _PrmAngle(object):
         """Return parameter values in string format."""
         return "fc={:.3f}, th0={:.3f})".format(self.fc, self.theta0)
 
+    @property
+    def _value_key(self):
+        return (round(self.fc, 3), round(self.theta0, 3))
+
+    @staticmethod
+    def get_atom_types(atom_types):
+        """Return the atom types (tuple) in the order of the identifier"""
+        # smaller of forward or reverse lists, "CA OS CT" not "CT OS CA"
+        ats = tuple(atom_types)
+        rats = ats[::-1]
+        return ats if ats <= rats else rats
+
     @staticmethod
     def get_id(atom_types):
         """Return the unique identifier (sorted atom types)"""
-        # smaller of forward or reverse lists, "CA OS CT" not "CT OS CA"
-        return " ".join(min(atom_types, list(reversed(atom_types))))
+        return " ".join(_PrmAngle.get_atom_types(atom_types))
 
 
 class _PrmTorsion(object):
+    __slots__ = ("is_generic", "multiplicities", "_abs_mults", "fcs",
+                 "phases", "npaths", "prm_id", "atom_types",
+                 "_generic_sort_key", "_sorted_prms", "comment")
+
     def __init__(self, atom_types, comment=None):
         self.is_generic = True if "?" in atom_types else False
         self.multiplicities = []
-        self._abs_mults = []
+        self._abs_mults = set()   # rounded abs. multiplicities, see add_prm
         self.fcs = []
         self.phases = []
         self.npaths = []
-        self.prm_id = self.get_id(atom_types)
-        self.atom_types = self.prm_id.split()
-        self._comment = comment
+        self._sorted_prms = None   # cache of get_prms, reset in add_prm
+        self.atom_types = self.get_atom_types(atom_types)
+        self.prm_id = intern(" ".join(self.atom_types))
+        # leading spaces sort parameters with more wildcards first
+        self._generic_sort_key = self.prm_id.count("?") * " " + self.prm_id
+        self.comment = " # {}".format(comment) if comment else ""
 
     def __repr__(self):
         fcs = ", ".join("{:.4f}".format(fc) for fc in self.fcs)
@@ -1193,18 +1269,24 @@ class _PrmTorsion(object):
                "npaths=({})".format(fcs, mults, phases, npaths)
 
     @property
-    def comment(self):
-        if self._comment:
-            return " # {}".format(self._comment)
-        else:
-            return ""
+    def _value_key(self):
+        return tuple((round(fc, 4), round(mult, 1),
+                      round(phase, 1), round(npaths, 1))
+                     for fc, mult, phase, npaths in self.get_prms())
 
     @staticmethod
-    def get_id(atom_types):
-        """Return the unique identifier (sorted atom types)"""
+    def get_atom_types(atom_types):
+        """Return the atom types (tuple) in the order of the identifier"""
         # smaller of forward or reverse lists, "CA CB CG OG1"
         # instead of "OG1 CG CB CA"
-        return " ".join(min(atom_types, list(reversed(atom_types))))
+        ats = tuple(atom_types)
+        rats = ats[::-1]
+        return ats if ats <= rats else rats
+
+    @staticmethod
+    def get_id(atom_types):
+        """Return the unique identifier (sorted atom types)"""
+        return " ".join(_PrmTorsion.get_atom_types(atom_types))
 
 
     def add_prm(self, fc, multiplicity, phase, npaths):
@@ -1218,7 +1300,8 @@ class _PrmTorsion(object):
         # we here raise an exception.
 
         amult = abs(multiplicity)
-        if any([abs(amult-abs(mult)) < 1e-7 for mult in self.multiplicities]):
+        amult_key = round(amult * 1e7)
+        if amult_key in self._abs_mults:
             raise ValueError("Duplicate parameter - multiplicity")
 
         # this is to ensure that the useless negative multiplicities
@@ -1226,10 +1309,12 @@ class _PrmTorsion(object):
         if abs(phase) < 1e-7 or abs(phase - 180) < 1e-7:
             multiplicity = amult
 
+        self._abs_mults.add(amult_key)
         self.multiplicities.append(multiplicity)
         self.fcs.append(fc)
         self.phases.append(phase)
         self.npaths.append(npaths)
+        self._sorted_prms = None
 
     def get_prms(self):
         """Return a list of the torsion parameters.
@@ -1240,14 +1325,17 @@ class _PrmTorsion(object):
           (fc2, multiplicity2, phase2, npaths2),
           (fc3, multiplicity3, phase3, npaths3) ]
         """
-        prms = sorted(zip(self.fcs, self.multiplicities,
-                          self.phases, self.npaths),
-                      key=lambda x: x[1])
-
-        return prms
+        if self._sorted_prms is None:
+            self._sorted_prms = sorted(zip(self.fcs, self.multiplicities,
+                                           self.phases, self.npaths),
+                                       key=itemgetter(1))
+        return list(self._sorted_prms)
 
 
 class _PrmImproper(object):
+    __slots__ = ("is_generic", "fc", "phi0", "multiplicity", "prm_id",
+                 "atom_types", "_generic_sort_key", "comment")
+
     def __init__(self, center_atom_type, other_atom_types,
                  fc, phi0, multiplicity=2.0, comment=None):
         self.is_generic = True if "?" in other_atom_types else False
@@ -1257,20 +1345,16 @@ class _PrmImproper(object):
             raise QPrmError("Q does not support multiplicity != 2.0 in "
                             "impropers ({})".format(self))
         self.multiplicity = multiplicity
-        self.prm_id = self.get_id(center_atom_type, other_atom_types)
-        self.atom_types = self.prm_id.split()
-        self._comment = comment
-
-    @property
-    def comment(self):
-        if self._comment:
-            return " # {}".format(self._comment)
-        else:
-            return ""
+        self.atom_types = self.get_atom_types(center_atom_type,
+                                              other_atom_types)
+        self.prm_id = intern(" ".join(self.atom_types))
+        # leading spaces sort parameters with more wildcards first
+        self._generic_sort_key = self.prm_id.count("?") * " " + self.prm_id
+        self.comment = " # {}".format(comment) if comment else ""
 
     @staticmethod
-    def get_id(center_atom_type, other_atom_types):
-        """Return the unique identifier (sorted atom types)"""
+    def get_atom_types(center_atom_type, other_atom_types):
+        """Return the atom types (tuple) in the order of the identifier"""
         # sorted, with center (second) fixed, "CB CG OG1 OG2"
         # instead of "OG1 CG CB OG2" or "CB CG OG2 OG1" or ...
 
@@ -1280,14 +1364,20 @@ class _PrmImproper(object):
         ats = [x for x in sorted(other_atom_types) if x != "?"]
         if len(ats) == 3:
             # switch 2 and 3
-            a_types = [ats[0], center_atom_type, ats[1], ats[2]]
+            a_types = (ats[0], center_atom_type, ats[1], ats[2])
         elif len(ats) == 2:
-            a_types = ["?", center_atom_type, ats[0], ats[1]]
+            a_types = ("?", center_atom_type, ats[0], ats[1])
         elif len(ats) == 1:
-            a_types = ["?", center_atom_type, ats[0], "?"]
+            a_types = ("?", center_atom_type, ats[0], "?")
         else:
             raise QPrmError("Improper with three wildcard atom types?")
-        return " ".join(a_types)
+        return a_types
+
+    @staticmethod
+    def get_id(center_atom_type, other_atom_types):
+        """Return the unique identifier (sorted atom types)"""
+        return " ".join(_PrmImproper.get_atom_types(center_atom_type,
+                                                    other_atom_types))
 
     def __repr__(self):
         return "_PrmImproper({}, {})".format(self.prm_id, self.strval)
@@ -1297,4 +1387,8 @@ class _PrmImproper(object):
         """Return parameter values in string format."""
         return "fc={:.3f}, phi0={:.3f}".format(self.fc, self.phi0)
 
+    @property
+    def _value_key(self):
+        return (round(self.fc, 3), round(self.phi0, 3))
+
 
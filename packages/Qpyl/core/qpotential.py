@@ -32,10 +32,8 @@ implemented in Q.
 """
 
 from __future__ import absolute_import, unicode_literals, division
-from six.moves import zip
 import math
 
-from Qpyl.core import qstructure
 from Qpyl.common import __version__, raise_or_log
 
 
@@ -50,11 +48,8 @@ def bond_distance(ac1, ac2):
       r (float):   distance in Angstrom
     """
 
-    r21 = qstructure.PosVector(x=ac1.x - ac2.x,
-                               y=ac1.y - ac2.y,
-                               z=ac1.z - ac2.z)
-
-    return math.sqrt(sum([a**2 for a in r21]))
+    x, y, z = ac1.x - ac2.x, ac1.y - ac2.y, ac1.z - ac2.z
+    return math.sqrt(x*x + y*y + z*z)
 
 
 def angle_angle(ac1, ac2, ac3):
@@ -68,20 +63,17 @@ def angle_angle(ac1, ac2, ac3):
       theta (float):   angle in Degrees
     """
 
-    r21 = qstructure.PosVector(x=ac1.x - ac2.x,
-                               y=ac1.y - ac2.y,
-                               z=ac1.z - ac2.z)
-
-    r23 = qstructure.PosVector(x=ac3.x - ac2.x,
-                               y=ac3.y - ac2.y,
-                               z=ac3.z - ac2.z)
+    # vectors between atoms (2->1 and 2->3), unpacked into floats to
+    # avoid temporary PosVector and list objects in this hot path
+    x21, y21, z21 = ac1.x - ac2.x, ac1.y - ac2.y, ac1.z - ac2.z
+    x23, y23, z23 = ac3.x - ac2.x, ac3.y - ac2.y, ac3.z - ac2.z
 
     # get the angle from the dot product equation
     # ( A*B = |A|*|B|*cos(theta) )
     # where A and B are vectors bewteen atoms (2->1 and 2->3)
-    dr21 = math.sqrt(sum([a**2 for a in r21]))
-    dr23 = math.sqrt(sum([a**2 for a in r23]))
-    dot_product = sum([a*b for (a, b) in zip(r21, r23)])
+    dr21 = math.sqrt(x21*x21 + y21*y21 + z21*z21)
+    dr23 = math.sqrt(x23*x23 + y23*y23 + z23*z23)
+    dot_product = x21*x23 + y21*y23 + z21*z23
     cos_theta = 1.0*dot_product/(dr21*dr23)
     theta = math.acos(cos_theta)   # in radians
     return 180.0 * theta/math.pi
@@ -99,32 +91,24 @@ def torsion_angle(ac1, ac2, ac3, ac4):
 
     """
 
-    r21 = qstructure.PosVector(x=ac1.x - ac2.x,
-                               y=ac1.y - ac2.y,
-                               z=ac1.z - ac2.z)
-
-    r23 = qstructure.PosVector(x=ac3.x - ac2.x,
-                               y=ac3.y - ac2.y,
-                               z=ac3.z - ac2.z)
-
-    r34 = qstructure.PosVector(x=ac4.x - ac3.x,
-                               y=ac4.y - ac3.y,
-                               z=ac4.z - ac3.z)
+    x21, y21, z21 = ac1.x - ac2.x, ac1.y - ac2.y, ac1.z - ac2.z
+    x23, y23, z23 = ac3.x - ac2.x, ac3.y - ac2.y, ac3.z - ac2.z
+    x34, y34, z34 = ac4.x - ac3.x, ac4.y - ac3.y, ac4.z - ac3.z
 
     # vector product n2 = r21 x r23
-    n2 = qstructure.PosVector(x=r21.y*r23.z - r21.z*r23.y,
-                              y=r21.z*r23.x - r21.x*r23.z,
-                              z=r21.x*r23.y - r21.y*r23.x)
+    x2 = y21*z23 - z21*y23
+    y2 = z21*x23 - x21*z23
+    z2 = x21*y23 - y21*x23
     # vector product n3 = r34 x r23
-    n3 = qstructure.PosVector(x=r34.y*r23.z - r34.z*r23.y,
-                              y=r34.z*r23.x - r34.x*r23.z,
-                              z=r34.x*r23.y - r34.y*r23.x)
+    x3 = y34*z23 - z34*y23
+    y3 = z34*x23 - x34*z23
+    z3 = x34*y23 - y34*x23
 
     # get the angle from the dot product equation ( A*B = |A|*|B|*cos(phi) )
     # where A and B are normal vectors n2 and n3
-    dn2 = math.sqrt(sum([a**2 for a in n2]))
-    dn3 = math.sqrt(sum([a**2 for a in n3]))
-    dot_product = sum([a*b for (a, b) in zip(n2, n3)])
+    dn2 = math.sqrt(x2*x2 + y2*y2 + z2*z2)
+    dn3 = math.sqrt(x3*x3 + y3*y3 + z3*z3)
+    dot_product = x2*x3 + y2*y3 + z2*z3
 
     cos_phi = 1.0*dot_product/(dn2*dn3)
     if cos_phi < -1: cos_phi = -1
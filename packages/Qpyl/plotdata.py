@@ -64,6 +64,10 @@ class PlotDataJSONDecoder(json.JSONDecoder):
         super(PlotDataJSONDecoder,
                 self).__init__(object_pairs_hook=self.decode_plotdata)
 
+    def load(self, fp):
+        """Decode the JSON document in the text file object 'fp'."""
+        return self.decode(fp.read())
+
     def decode_plotdata(self, d):
         d = ODict(d)
         if "__type__" not in d:
@@ -101,8 +105,18 @@ class PlotData(object):
                                       ("yerror", yerror)])
 
 
-    # TODO: clean this code, looks almost as bad as Javascript
     def export_grace(self):
+        return "".join(self.export_grace_lines())
+
+    # TODO: clean this code, looks almost as bad as Javascript
+    def export_grace_lines(self):
+        """Generate the Grace (xmgrace) document line by line.
+
+        The data lines are generated as they are needed, so the document
+        can be written to a file without building it in memory:
+
+            f.writelines(plot.export_grace_lines())
+        """
         if self.plot_type == "line":
             typ = "xy"
         elif self.plot_type == "bar":
@@ -112,35 +126,38 @@ class PlotData(object):
         elif self.plot_type == "wireframe":
             raise PlotDataError("Cannot export wireframe data to grace...")
 
-        set_config = ""
-        sets = ""
+        # the set config and type are needed before the data
+        set_config = []
+        yerrors = []
         for i, (label, sp) in enumerate(six.iteritems(self.subplots)):
             # create this:
             # @s0 legend "rep_000"
             # @s1 legend "rep_001" ...
-            set_config += "@s{} legend \"{}\" \n".format(i, label) 
+            set_config.append("@s{} legend \"{}\" \n".format(i, label))
             if typ == "bar":
                 # don't show the line in bar plots
-                set_config += "@s{} line type 0 \n".format(i)
+                set_config.append("@s{} line type 0 \n".format(i))
 
-            # add the data
             if not sp["yerror"] or len(sp["yerror"]) != len(sp["xdata"]):
-                yerror=["" for x in sp["xdata"]]
+                yerrors.append(None)
             else:
-                yerror = sp["yerror"]
+                yerrors.append(sp["yerror"])
                 typ = typ + "dy"
-            for x, y, dy in zip(sp["xdata"], sp["ydata"], yerror):
-                sets += "{} {} {}\n".format(x, y, dy)
-            sets += "&\n"
-        
-        return """#
-@type {typ}
-@title "{title}"
-@xaxis label "{xlabel}"
-@yaxis label "{ylabel}"
-{set_config}
-{sets}
-
-""".format(typ=typ, title=self.title, xlabel=self.xlabel, ylabel=self.ylabel, set_config=set_config, sets=sets)
-
 
+        yield "#\n"
+        yield "@type {}\n".format(typ)
+        yield "@title \"{}\"\n".format(self.title)
+        yield "@xaxis label \"{}\"\n".format(self.xlabel)
+        yield "@yaxis label \"{}\"\n".format(self.ylabel)
+        for line in set_config:
+            yield line
+        yield "\n"
+
+        # add the data
+        for sp, yerror in zip(self.subplots.values(), yerrors):
+            if yerror is None:
+                yerror = ["" for x in sp["xdata"]]
+            for x, y, dy in zip(sp["xdata"], sp["ydata"], yerror):
+                yield "{} {} {}\n".format(x, y, dy)
+            yield "&\n"
+        yield "\n\n"
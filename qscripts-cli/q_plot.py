@@ -27,17 +27,21 @@
 from __future__ import absolute_import, print_function
 from __future__ import division, unicode_literals
 import six
-from six.moves import range
 from six.moves import zip
+from six.moves import cPickle as pickle
 
 from qscripts_config import __version__, QScriptsConfig as QScfg
 
 import os
 import sys
 import math
-import six.moves.tkinter as Tk
+import time
+import hashlib
+import tempfile
 import argparse
-from collections import OrderedDict as ODict
+from collections import OrderedDict as ODict, defaultdict
+from itertools import chain
+from concurrent.futures import ThreadPoolExecutor
 
 from Qpyl.plotdata import PlotData, PlotDataError, PlotDataJSONDecoder
 from Qpyl.common import get_version_full
@@ -66,8 +70,18 @@ class PlotApp():
         self.plotdata_files = plotdata_files    #  [ "/home/.../pro/qa.PlotData.pickle", "/home/.../wat/qa.PlotData.pickle" ]
         self.nrows = 1
         self.ncols = 1
-        self.blocked_draw = False
-        self.subplot_lines = {}
+        self.subplot_lines = defaultdict(list)
+        # pending redraw (see schedule_redraw)
+        self._redraw_after_id = None
+        self._redraw_forced = False
+        # backgrounds of subplots without the lines (for blitting),
+        # None if they have to be redrawn
+        self._backgrounds = None
+        self._capturing = False
+        # subplot parameters found by tight_layout and the layout they
+        # were computed for (see draw_plots)
+        self._layout_key = None
+        self._layout_pars = None
         self.legend_font = FontProperties(size="xx-small")
         
         self.lb1_entries = ODict()
@@ -80,6 +94,9 @@ class PlotApp():
             self.lb1.insert(Tk.END, plot_title)
         
         self.lb1.pack(fill=Tk.Y, side=Tk.LEFT)
+        # lb2 labels ("0/rep_000") : (plot_number, subplot_label) keys
+        # of subplot_lines, filled in on_select_lb1
+        self.lb2_entries = ODict()
         self.lb2 = Tk.Listbox(self.parent, selectmode=Tk.EXTENDED, exportselection=0)
         self.lb2.pack(fill=Tk.Y, side=Tk.LEFT)
         
@@ -101,6 +118,9 @@ class PlotApp():
         self.lb1.bind("<<ListboxSelect>>", self.on_select_lb1)
         self.lb2.bind("<<ListboxSelect>>", self.on_select_lb2)
         self.parent.bind("<Configure>", self.on_resize)
+        # any other redraw (toolbar zoom/pan, resize) invalidates the
+        # cached backgrounds
+        self.canvas.mpl_connect("draw_event", self.on_draw)
 
 
     def draw_legend(self):
@@ -113,6 +133,13 @@ class PlotApp():
         self.figure.legend(handls, labls, pos, prop=self.legend_font)
 
 
+    def get_selected_keys(self, listbox, entries):
+        # map the selected items in listbox to their values in entries
+        # (all items are fetched at once, listbox.get is a Tcl call)
+        items = listbox.get(0, Tk.END)
+        return [ entries[items[int(index)]] for index in listbox.curselection() ]
+
+
     def change_geometry(self):
         indices = [ int(sel) for sel in self.lb1.curselection() ]
         if not indices: return
@@ -151,10 +178,10 @@ class PlotApp():
         self.figure.clear()
 
         # clear the subplot_lines dictionary
-        self.subplot_lines = {}
+        self.subplot_lines = defaultdict(list)
 
         # get keys for the selected plots in lb1
-        plot_keys = [ self.lb1_entries[ self.lb1.get(int(index)) ] for index in self.lb1.curselection() ]
+        plot_keys = self.get_selected_keys(self.lb1, self.lb1_entries)
 
         for i, key in enumerate(plot_keys):   # example of plot_keys: [ "dgde", "egapl", "dgl", ... ]
             plots = self.plots[key]  
@@ -172,24 +199,36 @@ class PlotApp():
             if plots[0].plot_type == "bar" and \
                 isinstance(list(plots[0].subplots.values())[0]["xdata"][0],
                            six.string_types):
+                seen_categories = set()
                 for plot in plots.values():
                     for subplots in plot.subplots.values():
                         for i_cat, cat in enumerate(subplots["xdata"]):
-                            if cat not in bar_categories:
+                            if cat not in seen_categories:
+                                seen_categories.add(cat)
                                 bar_categories.insert(i_cat, cat)
 
             # plot the plots
             # example of plots:
             # { 0: protein_plot, 1: protein2_plot, 2: water_plot }
+            #
+            # lines are collected and drawn with a single plot() call
+            # when the loop is done:
+            # [ (subplot_key, color, xdata, ydata), ... ]
+            line_data = []
+            # bar width (same for all files)
+            width = 0.9/(len(plots))
             for plot_number, plot in six.iteritems(plots):
+                color = self._COLORS[plot_number]
+                color_light = self._COLORS_LIGHT[plot_number]
                 for subplot_label, subplot_data in six.iteritems(plot.subplots):
 
                     if plot.plot_type == "line":
-                        line, = plt.plot(subplot_data["xdata"],
-                                         subplot_data["ydata"],
-                                         color=self._COLORS[plot_number])
+                        line_data.append(((plot_number, subplot_label),
+                                          color,
+                                          subplot_data["xdata"],
+                                          subplot_data["ydata"]))
+                        continue
                     elif plot.plot_type == "bar":
-                        width = 0.9/(len(plots))
                         # string categories
                         if isinstance(subplot_data["xdata"][0], six.string_types):
                             # map values to category list made before
@@ -207,24 +246,25 @@ class PlotApp():
                                     ydata.append(0)
                                     yerror.append(0)
 
-                            xind = list(range(0, len(bar_categories)))
-                            xind = [x-0.45+plot_number*(width) for x in xind]
+                            xind = np.arange(len(bar_categories)) \
+                                   - 0.45 + plot_number*width
                             line = plt.bar(xind, ydata, width=width,
                                            yerr=yerror,
-                                           color=self._COLORS_LIGHT[plot_number])
+                                           color=color_light)
                             plt.set_xticks(xind)
                             plt.set_xticklabels(bar_categories, rotation=70)
                         else:
-                            xind = [x-0.45+plot_number*(width) for x in subplot_data["xdata"]]
+                            xind = np.asarray(subplot_data["xdata"]) \
+                                   - 0.45 + plot_number*width
                             line = plt.bar(xind, subplot_data["ydata"],
                                     width=width,
                                     yerr=subplot_data["yerror"],
-                                    color=self._COLORS_LIGHT[plot_number] )
+                                    color=color_light)
 
                     elif plot.plot_type == "scatter":
                         line = plt.scatter(subplot_data["xdata"],
                                            subplot_data["ydata"],
-                                           color=self._COLORS[plot_number],
+                                           color=color,
                                            marker="s")
 
                     elif plot.plot_type == "wireframe":
@@ -237,10 +277,18 @@ class PlotApp():
 
                     # add the line that was drawn to subplot_lines
                     # so that we can change color if lb2 selection changes
-                    subplot_label = "%d/%s" % (plot_number, subplot_label)
-                    if subplot_label not in list(self.subplot_lines.keys()):
-                        self.subplot_lines[subplot_label] = []
-                    self.subplot_lines[subplot_label].append(line)
+                    # (bar charts don't support this, they are not added)
+                    if plot.plot_type == "bar":
+                        continue
+                    subplot_key = (plot_number, subplot_label)
+                    self.subplot_lines[subplot_key].append(line)
+
+            if line_data:
+                lines = plt.plot(*chain.from_iterable((xdata, ydata)
+                                      for _, _, xdata, ydata in line_data))
+                for (subplot_key, color, _, _), line in zip(line_data, lines):
+                    line.set_color(color)
+                    self.subplot_lines[subplot_key].append(line)
 
             plt.set_title(plot.title)
             plt.set_xlabel(plot.xlabel)
@@ -248,27 +296,73 @@ class PlotApp():
 
         if plot_keys:
             self.draw_legend()
-            padding = len(self.plotdata_files) * 0.03
-            try:
-                self.figure.tight_layout(rect=[0, 0+padding, 1, 1])
-            except TypeError:
-                # rect doesn't exist in ancient matplotlib versions
-                self.figure.tight_layout()
-            except ValueError:
-                pass
-                
-
+            # tight_layout is slow, reuse its result if the selected plots,
+            # grid and canvas size didn't change since the last time
+            # (titles and labels of other plots need different margins)
+            layout_key = (self.nrows, self.ncols, tuple(plot_keys),
+                          len(self.plotdata_files),
+                          self.canvas.get_width_height())
+            if layout_key == self._layout_key:
+                self.figure.subplots_adjust(**self._layout_pars)
+            else:
+                padding = len(self.plotdata_files) * 0.03
+                try:
+                    self.figure.tight_layout(rect=[0, 0+padding, 1, 1])
+                except TypeError:
+                    # rect doesn't exist in ancient matplotlib versions
+                    self.figure.tight_layout()
+                except ValueError:
+                    pass
+                sp = self.figure.subplotpars
+                self._layout_pars = dict((k, getattr(sp, k)) for k in
+                                         ("left", "right", "bottom", "top",
+                                          "wspace", "hspace"))
+                self._layout_key = layout_key
+
+
+            self.draw_canvas()
+
+
+    def draw_canvas(self):
+        # Draw the figure and cache the backgrounds of the subplots
+        # (everything but the lines in subplot_lines), so that
+        # on_select_lb2 only has to redraw the lines (blitting).
+        lines = [line for subplot_line_list in self.subplot_lines.values()
+                      for line in subplot_line_list]
+
+        if any(ax.name == "3d" for ax in self.figure.axes) or \
+                not getattr(self.canvas, "supports_blit", True):
+            # 3d projections are done in Axes3D.draw, no blitting
             self.canvas.draw()
-        self.blocked_draw = False
+            self._backgrounds = None
+            return
+
+        self._capturing = True
+        for line in lines:
+            line.set_animated(True)
+        self.canvas.draw()
+        self._backgrounds = [(ax, self.canvas.copy_from_bbox(ax.bbox))
+                             for ax in self.figure.axes]
+        for line in lines:
+            line.set_animated(False)
+            line.axes.draw_artist(line)
+        self.canvas.blit(self.figure.bbox)
+        self._capturing = False
+
+
+    def on_draw(self, event):
+        if not self._capturing:
+            self._backgrounds = None
 
 
     def on_select_lb1(self,event):
 
         # remove and add all subplots to lb2 (1/rep_000,1/rep_001... 2/rep_000,2/rep_001...)
         self.lb2.delete(0, Tk.END)
+        self.lb2_entries.clear()
 
         # get keys for the selected plots in lb1
-        plot_keys = [ self.lb1_entries[ self.lb1.get(int(index)) ] for index in self.lb1.curselection() ]
+        plot_keys = self.get_selected_keys(self.lb1, self.lb1_entries)
 
         # iterate through all the selected plots (lb1)
         # iterate through all the plots with the same key
@@ -278,50 +372,140 @@ class PlotApp():
         # if exists do not append it (subplots from different keys have the
         #      same label - protein dG_dE, protein dG_lambda, ... and should be combined)
         for i,key in enumerate(plot_keys):
-
-            subplots_labels = []
-
             for plot_number, plot in six.iteritems(self.plots[key]):
                 for subplot_label in sorted(plot.subplots.keys()):
-                    subplot_label = "%d/%s" % (plot_number, subplot_label)
-                    if subplot_label not in subplots_labels:
-                        subplots_labels.append(subplot_label)
+                    subplot_key = (plot_number, subplot_label)
+                    subplot_label = "%d/%s" % subplot_key
+                    self.lb2_entries.setdefault(subplot_label, subplot_key)
 
-        self.lb2.insert(0, *subplots_labels)
+        if self.lb2_entries:
+            self.lb2.insert(0, *self.lb2_entries.keys())
         self.lb2.selection_set(0, Tk.END)
-    
-        if not self.blocked_draw:
-            self.blocked_draw = True
-            self.change_geometry()
-            self.draw_plots()
+
+        self.schedule_redraw(100)
 
 
     def on_select_lb2(self,event):
 
         # get selected subplots from lb2
-        selected_subplots_keys = [ self.lb2.get(int(index)) for index in self.lb2.curselection() ]
+        selected_subplots_keys = set(self.get_selected_keys(self.lb2,
+                                                            self.lb2_entries))
         for subplot_key, subplot_line_list in six.iteritems(self.subplot_lines):
             for subplot_line in subplot_line_list:
-                plot_number = int(subplot_key.split("/")[0])
                 if subplot_key in selected_subplots_keys:
                     alpha, lw = self._ALPHA_SEL, self._LINEWEIGHT_SEL
                 else:
                     alpha, lw = self._ALPHA_DESEL, self._LINEWEIGHT_DESEL
-                try:
-                    subplot_line.set_alpha(alpha)
-                    subplot_line.set_linewidth(lw)
-                except AttributeError:
-                    pass   # bar chart doesn't support this 
+                subplot_line.set_alpha(alpha)
+                subplot_line.set_linewidth(lw)
 
-        self.canvas.draw()
+        if self._backgrounds is None:
+            self.draw_canvas()
+            return
+
+        # restore the backgrounds and redraw only the lines
+        for ax, background in self._backgrounds:
+            self.canvas.restore_region(background)
+        for subplot_line_list in six.itervalues(self.subplot_lines):
+            for subplot_line in subplot_line_list:
+                subplot_line.axes.draw_artist(subplot_line)
+        for ax, background in self._backgrounds:
+            self.canvas.blit(ax.bbox)
 
     
     def on_resize(self,event):
-    
-        if not self.blocked_draw:
-            if self.change_geometry():
-                self.blocked_draw = True   # it would otherwise redraw the whole canvas with every change in geometry
-                self.parent.after(500, self.draw_plots)
+        # redraw only if the layout of the subplots changes
+        self.schedule_redraw(250, force=False)
+
+
+    def schedule_redraw(self, delay, force=True):
+        # Redraw the plots after 'delay' ms, replacing the pending redraw
+        # if there is one, so that a burst of events (<Configure> while
+        # resizing the window, dragging the selection in lb1) ends in a
+        # single redraw. If none of the scheduled redraws were forced,
+        # the plots are redrawn only if change_geometry() says so.
+        if self._redraw_after_id is not None:
+            self.parent.after_cancel(self._redraw_after_id)
+        self._redraw_forced = self._redraw_forced or force
+        self._redraw_after_id = self.parent.after(delay, self._redraw)
+
+
+    def _redraw(self):
+        force = self._redraw_forced
+        self._redraw_after_id = None
+        self._redraw_forced = False
+        if self.change_geometry() or force:
+            self.draw_plots()
+
+
+# decoded PlotData.json files are cached (pickled) in PLOTCACHE_DIR, one
+# file per plotfile path; the cache is used only if it was made by this
+# version from a plotfile with the same size and modification time
+PLOTCACHE_DIR = os.path.join(os.environ.get("XDG_CACHE_HOME",
+                                            os.path.expanduser("~/.cache")),
+                             "qtools", "q_plot")
+PLOTCACHE_TAG = "PlotData-{}".format(__version__)
+# caches not used for this long are removed (see prune_plotcache)
+PLOTCACHE_MAX_AGE = 30 * 24 * 3600
+
+def prune_plotcache():
+    # create the cache directory (before the workers write to it) and
+    # remove the caches that haven't been used for PLOTCACHE_MAX_AGE
+    # seconds, their plotfiles were probably moved or deleted
+    try:
+        os.makedirs(PLOTCACHE_DIR, exist_ok=True)
+        too_old = time.time() - PLOTCACHE_MAX_AGE
+        for fn in os.listdir(PLOTCACHE_DIR):
+            fn = os.path.join(PLOTCACHE_DIR, fn)
+            if os.path.getmtime(fn) < too_old:
+                os.remove(fn)
+    except OSError:
+        # the workers will fail to write the caches as well, that's fine
+        pass
+
+def load_plotfile(pf, jsondec, use_cache=True):
+    # read and decode a PlotData.json file (in a worker thread),
+    # or load the cached objects if the file didn't change since
+    if not use_cache:
+        with open(pf, 'r') as plotfile:
+            return jsondec.load(plotfile)
+
+    pf = os.path.abspath(pf)
+    pf_stat = os.stat(pf)
+    pf_id = (PLOTCACHE_TAG, pf, pf_stat.st_size, pf_stat.st_mtime)
+    pf_hash = hashlib.sha1(pf.encode("utf-8")).hexdigest()
+    cache = os.path.join(PLOTCACHE_DIR, pf_hash + ".pkl")
+    try:
+        with open(cache, 'rb') as cachefile:
+            if pickle.load(cachefile) == pf_id:
+                plots = pickle.load(cachefile)
+                try:
+                    # mark it as used, for prune_plotcache
+                    os.utime(cache, None)
+                except OSError:
+                    pass
+                return plots
+    except Exception:
+        # no cache, or it can't be unpickled (old, broken, ...)
+        pass
+
+    with open(pf, 'r') as plotfile:
+        plots = jsondec.load(plotfile)
+
+    # write to a temporary file first, so that a half written
+    # cache is never loaded
+    tmp = None
+    try:
+        fd, tmp = tempfile.mkstemp(dir=PLOTCACHE_DIR)
+        with os.fdopen(fd, 'wb') as cachefile:
+            pickle.dump(pf_id, cachefile, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(plots, cachefile, protocol=pickle.HIGHEST_PROTOCOL)
+        os.rename(tmp, cache)
+    except (IOError, OSError, pickle.PicklingError):
+        # can't write the cache, decode the json next time
+        if tmp and os.path.lexists(tmp):
+            os.remove(tmp)
+    return plots
 
 
 if __name__ == "__main__":
@@ -339,6 +523,10 @@ if __name__ == "__main__":
                         help="Export plots in Grace format to this directory: "
                              "'{}'. Try without args, to see available plots."
                              "".format(QScfg.get("files", "plot_export_dir")))
+    optarg.add_argument("--nocache", dest="nocache", action="store_true",
+                        default=False,
+                        help="Don't use or write the cache of decoded "
+                             "plotfiles in '{}'.".format(PLOTCACHE_DIR))
     optarg.add_argument("-v", "--version", action="version",
                         version=get_version_full())
     optarg.add_argument("-h", "--help", action="help", help="show this "
@@ -368,13 +556,26 @@ if __name__ == "__main__":
     #
     allplots = ODict()    
 
-    for pf_number, pf in enumerate(args.plotfiles):
+    for pf in args.plotfiles:
         if not os.path.lexists(pf):
             print("File '%s' doesn't exist." % pf)
             sys.exit(1)
+
+    # exports are usually one-off, don't cache those
+    use_cache = not args.nocache and not hasattr(args, "export")
+    if use_cache:
+        prune_plotcache()
+
+    # read and decode the files in parallel, check and merge them in order
+    # (one decoder is shared by all files, decoding doesn't change its state)
+    jsondec = PlotDataJSONDecoder()
+    with ThreadPoolExecutor(max_workers=len(args.plotfiles)) as executor:
+        loaded = [executor.submit(load_plotfile, pf, jsondec, use_cache)
+                  for pf in args.plotfiles]
+
+    for pf_number, (pf, pf_loaded) in enumerate(zip(args.plotfiles, loaded)):
         try:
-            jsondec = PlotDataJSONDecoder()
-            plots = jsondec.decode(open(pf, 'r').read())
+            plots = pf_loaded.result()
         except Exception as e:
             raise
             print("Could not read data file '%s'. Are you sure it is a .json file?" % pf)
@@ -382,20 +583,19 @@ if __name__ == "__main__":
         if not isinstance(plots, ODict):
             print("Something is wrong with the data file '%s'. Aborting..." % pf)
             sys.exit(1)
+        if not all(isinstance(plot, PlotData) for plot in six.itervalues(plots)):
+            print("Something is wrong with the data file '%s'. Aborting..." % pf)
+            sys.exit(1)
         for plot_id, plot in six.iteritems(plots):
-            if not isinstance(plot, PlotData):
-                print("Something is wrong with the data file '%s'. Aborting..." % pf)
-                sys.exit(1)
-
-            try:
-                allplots[plot_id][pf_number] = plot
-            except KeyError:
-                allplots[plot_id] = ODict( [(pf_number,plot)] )
+            allplots.setdefault(plot_id, ODict())[pf_number] = plot
 
     plotdata_files = [ os.path.abspath(pf) for pf in args.plotfiles ]
 
     if not hasattr(args, "export"):
 # run gui
+        # Tk and matplotlib are imported only here, exporting to Grace
+        # is plain text and works without them (and without a display)
+        import six.moves.tkinter as Tk
         try:
             import matplotlib
             matplotlib.use('TkAgg')
@@ -455,7 +655,8 @@ if __name__ == "__main__":
             plot = plots[0]
             try:
                 fn = os.path.join(exdir, "%s.agr" % plot_id)
-                open(fn, 'w').write( plot.export_grace() )
+                with open(fn, 'w') as agr:
+                    agr.writelines(plot.export_grace_lines())
                 print("Wrote '%s' to %s" % (plot.title, fn))
             except (IOError, PlotDataError) as e:
                 print("Could not export '%s': %s" % (plot.title, str(e)))
@@ -13,12 +13,12 @@ def is_close(a, b, rel_tol=1e-09, abs_tol=0.0):
 
 class TestQFepOutput:
 
-    @pytest.fixture
+    @pytest.fixture(scope='session')
     def qco1(self):
         qco_str = open("data/qcalc.out.1", "r").read()
         return QCalcOutput(qco_str)
 
-    @pytest.fixture
+    @pytest.fixture(scope='session')
     def qco2(self):
         qco_str = open("data/qcalc.out.2", "r").read()
         return QCalcOutput(qco_str)
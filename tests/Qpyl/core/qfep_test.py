@@ -16,13 +16,13 @@ class TestQFepOutput:
 
     @pytest.fixture(scope='session')
     def qfo1(self):
-        qfo_str = open("data/qfep.out.1", "r").read()
-        return QFepOutput(qfo_str)
+        with open("data/qfep.out.1", "r") as qfo_file:
+            return QFepOutput(qfo_file.read())
 
     @pytest.fixture(scope='session')
     def qfo2(self):
-        qfo_str = open("data/qfep.out.2", "r").read()
-        return QFepOutput(qfo_str)
+        with open("data/qfep.out.2", "r") as qfo_file:
+            return QFepOutput(qfo_file.read())
 
     def test_bad_output(self):
         with pytest.raises(QFepOutputError):
@@ -6,6 +6,7 @@
 from __future__ import absolute_import
 from __future__ import print_function
 import re
+import io
 import pytest
 from Qpyl.core.qparameter import QPrm, QPrmError
 from Qpyl.core.qstructure import QStruct
@@ -45,6 +46,44 @@ class TestQ:
 
         assert qp_str == qp_str2
 
+    def test_write_to(self, tmpdir):
+        with io.open("data/qamber14.prm", "r") as prmfile:
+            qp_str = prmfile.read()
+        qp_str = re.sub(r"(\*|\!|#).*", "", qp_str)
+        qp_str = re.sub(r"\s+$", "", qp_str, 0, re.MULTILINE)
+        qp_str = re.sub(r"^\n", "", qp_str, 0, re.MULTILINE)
+
+        qprm = QPrm("amber")
+        qprm.read_prm("data/qamber14.prm")
+        prm_fn = str(tmpdir.join("qamber14.prm"))
+        with io.open(prm_fn, "w") as prmfile:
+            qprm.write_to(prmfile)
+
+        with io.open(prm_fn, "r") as prmfile:
+            qp_str2 = prmfile.read()
+        qp_str2 = re.sub(r"\s+$", "", qp_str2, 0, re.MULTILINE)
+        qp_str2 = re.sub(r"^\n", "", qp_str2, 0, re.MULTILINE)
+        assert qp_str == qp_str2
+
+        # and read it back
+        qprm2 = QPrm("amber")
+        qprm2.read_prm(prm_fn)
+        assert list(qprm2.bonds.keys()) == list(qprm.bonds.keys())
+        assert qprm2.bonds["Br CA"].fc == qprm.bonds["Br CA"].fc
+        assert qprm2.torsions["Cstar CT CX N3"].fcs == \
+                qprm.torsions["Cstar CT CX N3"].fcs
+
+
+    def test_read_prm_comments(self, tmpdir):
+        prm_fn = str(tmpdir.join("comments.prm"))
+        with open(prm_fn, "w") as prm_file:
+            prm_file.write("[bonds]\n"
+                           "CT CT   1.0  2.0  # hello!\n"
+                           "CT HC   3.0  4.0  # a ! b !!\n")
+        qprm = QPrm("amber")
+        qprm.read_prm(prm_fn)
+        assert qprm.bonds["CT CT"].comment == " # hello"
+        assert qprm.bonds["CT HC"].comment == " # a ! b"
 
     def test_wrong_ff_fail(self):
         qprm = QPrm("amber")
@@ -93,6 +132,34 @@ class TestQ:
         assert i.fc == 10.5
         assert i.phi0 == 180.0
 
+    def test_bond_arrays(self):
+        qprm = QPrm("amber")
+        qprm.read_prm("data/qamber14.prm")
+        prm_ids, fcs, r0s = qprm.get_bond_arrays()
+        assert len(prm_ids) == len(fcs) == len(r0s) == len(qprm.bonds)
+        i = prm_ids.index("Br CA")
+        assert fcs[i] == 344.0
+        assert r0s[i] == 1.89
+
+    def test_atom_type_arrays(self):
+        qprm = QPrm("amber")
+        qprm.read_prm("data/qamber14.prm")
+        prm_ids, lj_Rs, lj_epss = qprm.get_atom_type_arrays()
+        assert len(prm_ids) == len(lj_Rs) == len(lj_epss)
+        i = prm_ids.index("Br")
+        assert lj_Rs[i] == qprm.atom_types["Br"].lj_R
+        assert lj_epss[i] == qprm.atom_types["Br"].lj_eps
+
+    def test_torsion_get_prms(self):
+        qprm = QPrm("oplsaa")
+        qprm.read_prm("data/ace_ash_nma.prm")
+        t = qprm.torsions["ash.CA ash.CB ash.CG ash.OD2"]
+        prms = t.get_prms()
+        assert [p[1] for p in prms] == [1.0, 2.0, 3.0]
+        t.add_prm(0.1, 4.0, 0.0, 1.0)
+        assert len(t.get_prms()) == len(prms) + 1
+        assert t.get_prms()[-1] == (0.1, 4.0, 0.0, 1.0)
+
 
 
 class TestAmber:
@@ -179,6 +246,13 @@ class TestOplsaa:
         assert len(qprm.torsions) == 49
         assert len(qprm.impropers) == 5
 
+    def test_read_ffld_no_comments(self):
+        qstruct = QStruct("data/ace_ash_nma.pdb", "pdb")
+        qprm = QPrm("oplsaa", keep_comments=False)
+        qprm.read_ffld("data/ace_ash_nma.ffld11", qstruct)
+        assert len(qprm.bonds) == 24
+        assert "#" not in qprm.get_string()
+
     def test_types_ffld(self):
         qstruct = QStruct("data/ace_ash_nma.pdb", "pdb")
         qprm = QPrm("oplsaa")
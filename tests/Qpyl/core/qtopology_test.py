@@ -1,4 +1,5 @@
 from __future__ import absolute_import
+import math
 from Qpyl.core.qparameter import QPrm
 from Qpyl.core.qlibrary import QLib
 from Qpyl.core.qstructure import QStruct
@@ -50,7 +51,7 @@ improper_definition            explicit\
 
     qas1 = QStruct("data/all_amino_acids.pdb", "pdb", ignore_errors=True)
     qat = QTopology(qal, qap, qas1)
-    q_tors = sum([len(list(tor.prm.get_prms())) for tor in qat.torsions])
+    q_tors = sum(len(tor.prm.get_prms()) for tor in qat.torsions)
 
     assert len(qat.bonds) == 464
     assert len(qat.angles) == 829
@@ -58,10 +59,10 @@ improper_definition            explicit\
     assert q_tors == 1950
     assert len(qat.impropers) == 102
 
-    be = sum([bond.calc()[0] for bond in qat.bonds])
-    ae = sum([ang.calc()[0] for ang in qat.angles])
-    te = sum([tor.calc()[0] for tor in qat.torsions])
-    ie = sum([imp.calc()[0] for imp in qat.impropers])
+    be = math.fsum(bond.calc()[0] for bond in qat.bonds)
+    ae = math.fsum(ang.calc()[0] for ang in qat.angles)
+    te = math.fsum(tor.calc()[0] for tor in qat.torsions)
+    ie = math.fsum(imp.calc()[0] for imp in qat.impropers)
 
     assert is_close(be, 181.2572830)
     assert is_close(ae, 212.8539304)
@@ -48,6 +48,13 @@ class TestPlotData:
         assert is_close(sub1["ydata"][0], 5.41)
         assert is_close(sub1["xdata"][-1], 215.47)
 
+    def test_decoder_load(self):
+        jsondec = PlotDataJSONDecoder()
+        with open("data/qaf.PlotData.json") as qaf_file:
+            plots = jsondec.load(qaf_file)
+        assert len(plots) == 44
+        assert isinstance(plots["dgde"], PlotData)
+
 
     def test_exporting(self):
         # export PlotData object to xmgrace output